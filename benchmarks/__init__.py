@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+name = "benchmarks"
+
+# Benchmarks for helpyr's hot paths. Run a suite as a module from the repo 
+# root, e.g.:
+# >>> python -m benchmarks.bench_kwarg_checker --output kwargs.json
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Micro-benchmarks for the per-call overhead of the kwarg_checker helpers.
+# >>> python -m benchmarks.bench_kwarg_checker [--output results.json] [--quick]
+
+import argparse
+
+import numpy as np
+
+from helpyr import kwarg_checker
+from helpyr.kwarg_checker import check_kwarg
+from helpyr.kwarg_checker import check_add_kwarg
+from helpyr.kwarg_checker import KwargChecker
+from helpyr.kwarg_checker import _assert_types
+
+from benchmarks.timing import BenchmarkResults
+
+# (value, arg_type) for each arg_type family. Each is timed with and without 
+# type casting.
+SCALAR_CASES = {
+        'untyped' : ('anything', None),
+        'none'    : (None, 'int-none'),
+        'int'     : (1, 'int'),
+        'int-pos' : (1, 'int-pos'),
+        'float'   : (1.0, 'float-whole'),
+        'int-float' : (1.0, 'int-float'),
+        'str'     : ('abc', 'str'),
+        'bool'    : (True, 'bool'),
+        }
+
+# Casting cases where the value actually changes type
+CAST_CASES = {
+        'str-to-int'   : ('1', 'int-tcast'),
+        'str-to-float' : ('1.0', 'float-tcast'),
+        'int-to-float' : (1, 'float-tcast'),
+        'str-to-int-float' : ('1.0', 'int-float-tcast'),
+        }
+
+def _sequence_cases(lengths):
+    # (name, value, arg_type) for sequences of increasing length
+    cases = []
+    for n in lengths:
+        ints = list(range(1, n + 1))
+        floats = [float(i) for i in ints]
+        strs = [str(i) for i in ints]
+        cases += [
+                (f"list-int[{n}]", ints, 'list-int'),
+                (f"list-int-pos[{n}]", ints, 'list-int-pos'),
+                (f"tuple-float[{n}]", tuple(floats), 'tuple-float'),
+                (f"list-float-tcast[{n}]", floats, 'list-float-tcast'),
+                (f"list-str-to-int-tcast[{n}]", strs, 'list-int-tcast'),
+                (f"array-float-pos[{n}]", np.array(floats), 'array-float-pos'),
+                (f"array-int-to-float-tcast[{n}]", np.array(ints),
+                    'array-float-tcast'),
+                ]
+    return cases
+
+
+def run(quick=False, verbose=True):
+    results = BenchmarkResults('kwarg_checker', verbose=verbose)
+    timing_kwargs = {'repeat': 3, 'min_time': 0.05} if quick else {}
+    lengths = [1, 100, 10000] if quick else [1, 10, 100, 1000, 10000, 100000]
+
+    # Scalar arg types through each entry point
+    for family, (value, arg_type) in SCALAR_CASES.items():
+        kwargs = {'x': value}
+        cast_type = None if arg_type is None else f"{arg_type}-tcast"
+        for cast_name, a_type in [('nocast', arg_type), ('tcast', cast_type)]:
+            results.time(f"_assert_types/{family}/{cast_name}",
+                    lambda: _assert_types(value, 'x', a_type), **timing_kwargs)
+            results.time(f"check_kwarg/{family}/{cast_name}",
+                    lambda: check_kwarg(kwargs, 'x', arg_type=a_type),
+                    **timing_kwargs)
+            results.time(f"check_add_kwarg/{family}/{cast_name}",
+                    lambda: check_add_kwarg(kwargs, 'x', arg_type=a_type),
+                    **timing_kwargs)
+            checker = KwargChecker(kwargs)
+            results.time(f"KwargChecker.check_kwarg/{family}/{cast_name}",
+                    lambda: checker.check_kwarg('x', arg_type=a_type),
+                    **timing_kwargs)
+
+    for family, (value, arg_type) in CAST_CASES.items():
+        kwargs = {'x': value}
+        results.time(f"check_kwarg/{family}",
+                lambda: check_kwarg(kwargs, 'x', arg_type=arg_type),
+                **timing_kwargs)
+
+    # Missing kwargs use the default
+    results.time("check_kwarg/default",
+            lambda: check_kwarg({}, 'x', default=1, arg_type='int'),
+            **timing_kwargs)
+
+    # Sequences and arrays of increasing length
+    for name, value, arg_type in _sequence_cases(lengths):
+        kwargs = {'x': value}
+        results.time(f"check_kwarg/{name}",
+                lambda: check_kwarg(kwargs, 'x', arg_type=arg_type),
+                **timing_kwargs)
+
+    # A typical function with several checked kwargs, the old way and with 
+    # the decorator
+    def closure_style(**kwargs):
+        check = kwarg_checker.get_check_kwarg_fu(kwargs)
+        return (check('a', 1, 'int-pos'), check('b', 'x', 'str'),
+                check('c', 2.0, 'float-tcast'), check('d', None))
+
+    @kwarg_checker.check_kwargs(
+            ('a', 1, 'int-pos'), ('b', 'x', 'str'),
+            ('c', 2.0, 'float-tcast'), ('d', None))
+    def decorator_style(**kwargs):
+        return kwargs['a'], kwargs['b'], kwargs['c'], kwargs['d']
+
+    results.time("function/get_check_kwarg_fu", lambda: closure_style(a=2),
+            **timing_kwargs)
+    results.time("function/check_kwargs", lambda: decorator_style(a=2),
+            **timing_kwargs)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description="Benchmark the kwarg_checker helpers")
+    parser.add_argument('-o', '--output', default=None,
+            help="JSON file to save the results in")
+    parser.add_argument('--quick', action='store_true',
+            help="Fewer repeats and shorter sequences")
+    args = parser.parse_args()
+
+    results = run(quick=args.quick)
+    if args.output is not None:
+        results.save(args.output)
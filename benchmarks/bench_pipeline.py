@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# End-to-end benchmarks for helpyr's heavy operations on synthetic data: 
+# Crawler file discovery, DataLoader text loading, and Di calculations. 
+# Reports time per call, throughput, and peak memory.
+# >>> python -m benchmarks.bench_pipeline [--output results.json] [--quick]
+#
+# Compare two result files with:
+# >>> python -m benchmarks.compare old.json new.json
+
+import argparse
+import contextlib
+import io
+import tempfile
+from os.path import join as pjoin
+
+from helpyr.crawler import Crawler
+from helpyr.data_loading import DataLoader
+from helpyr.logger import Logger
+from helpyr import Di_calculator
+
+from benchmarks import synthetic
+from benchmarks.timing import BenchmarkResults
+from benchmarks.timing import measure_peak_memory
+from benchmarks.timing import time_call
+
+
+def _quiet(function):
+    # Wrap function so its terminal output (e.g. crawler progress) is 
+    # dropped
+    def quiet_function():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function()
+    return quiet_function
+
+def _bench(results, name, function, n_items, item_name, timing_kwargs):
+    # Time function, then measure its peak memory on a separate call
+    function = _quiet(function)
+    stats = time_call(function, **timing_kwargs)
+    stats[f"{item_name}_per_s"] = round(n_items / stats['best'], 1)
+    stats['peak_MB'] = round(measure_peak_memory(function) / 2**20, 2)
+    results.add(name, stats)
+
+
+def bench_crawler(results, work_dir, configs, timing_kwargs):
+    for n_files, depth in configs:
+        root = pjoin(work_dir, f"tree_{n_files}_{depth}")
+        synthetic.make_directory_tree(root, n_files, depth)
+
+        crawler = _quiet(lambda: Crawler())()
+        crawler.set_root(root, verbose=False)
+        _bench(results, f"Crawler.get_target_files/{n_files}files/depth{depth}",
+                lambda: crawler.get_target_files(['*.txt'],
+                    verbose_file_list=False),
+                n_files, 'files', timing_kwargs)
+
+def bench_data_loader(results, work_dir, row_counts, timing_kwargs):
+    logger = _quiet(lambda: Logger(None, default_verbose=False))()
+    loader = _quiet(lambda: DataLoader(work_dir, logger=logger))()
+    for n_rows in row_counts:
+        txt_name = f"table_{n_rows}.txt"
+        n_bytes = synthetic.make_text_file(pjoin(work_dir, txt_name), n_rows)
+        _bench(results, f"DataLoader.load_txt/{n_rows}rows",
+                lambda: loader.load_txt(txt_name, {}),
+                n_bytes / 2**20, 'MB', timing_kwargs)
+
+        np_name = f"numeric_{n_rows}.txt"
+        n_bytes = synthetic.make_numeric_text_file(pjoin(work_dir, np_name),
+                n_rows)
+        _bench(results, f"DataLoader.load_txt_np/{n_rows}rows",
+                lambda: loader.load_txt_np(np_name),
+                n_bytes / 2**20, 'MB', timing_kwargs)
+
+def bench_Di(results, row_counts, timing_kwargs):
+    for n_rows in row_counts:
+        data = synthetic.make_sieve_masses(n_rows)
+        _bench(results, f"calc_Di/D50/{n_rows}rows",
+                lambda: Di_calculator.calc_Di(data, 50),
+                n_rows, 'rows', timing_kwargs)
+        _bench(results, f"calc_Dis/D16-D50-D84-D90/{n_rows}rows",
+                lambda: Di_calculator.calc_Dis(data, [16, 50, 84, 90]),
+                n_rows, 'rows', timing_kwargs)
+
+        chunk_size = max(1, n_rows // 10)
+        chunks = lambda: (data.iloc[i:i + chunk_size]
+                for i in range(0, n_rows, chunk_size))
+        _bench(results, f"calc_Di_chunked/D50/{n_rows}rows",
+                lambda: Di_calculator.calc_Di_chunked(chunks(), 50),
+                n_rows, 'rows', timing_kwargs)
+
+
+def run(quick=False, verbose=True, work_dir=None):
+    results = BenchmarkResults('pipeline', verbose=verbose)
+    if quick:
+        timing_kwargs = {'repeat': 3, 'min_time': 0.05}
+        crawler_configs = [(100, 2), (1000, 3)]
+        loader_rows = [1000, 10000]
+        Di_rows = [1000, 100000]
+    else:
+        timing_kwargs = {}
+        crawler_configs = [(100, 2), (1000, 3), (10000, 4), (10000, 8)]
+        loader_rows = [1000, 10000, 100000]
+        Di_rows = [1000, 100000, 1000000]
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        bench_crawler(results, tmp_dir, crawler_configs, timing_kwargs)
+        bench_data_loader(results, tmp_dir, loader_rows, timing_kwargs)
+    bench_Di(results, Di_rows, timing_kwargs)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description="Benchmark helpyr's data pipeline on synthetic data")
+    parser.add_argument('-o', '--output', default=None,
+            help="JSON file to save the results in")
+    parser.add_argument('--quick', action='store_true',
+            help="Smaller workloads and fewer repeats")
+    parser.add_argument('--work-dir', default=None,
+            help="Where to put the synthetic files (defaults to a temp dir)")
+    args = parser.parse_args()
+
+    results = run(quick=args.quick, work_dir=args.work_dir)
+    if args.output is not None:
+        results.save(args.output)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# Compare two benchmark result files (from any suite) and flag regressions.
+# >>> python -m benchmarks.compare baseline.json new.json [--threshold 1.1]
+# Exits with status 1 if any benchmark got slower than the threshold ratio.
+
+import argparse
+import sys
+
+from benchmarks.timing import format_time
+from benchmarks.timing import load_results
+
+
+def compare(baseline, new, threshold=1.1, stat='best'):
+    # Compare the results dicts from two result files. 
+    # Returns list of (name, old time, new time, ratio) for shared 
+    # benchmarks, and the names that are slower than threshold.
+    old_results = baseline['results']
+    new_results = new['results']
+    rows = []
+    regressions = []
+    for name in old_results:
+        if name not in new_results:
+            continue
+        old_time = old_results[name][stat]
+        new_time = new_results[name][stat]
+        ratio = new_time / old_time if old_time > 0 else float('inf')
+        rows.append((name, old_time, new_time, ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+def print_comparison(rows, regressions, threshold):
+    print(f"{'benchmark':60s} {'old':>11s} {'new':>11s}  ratio")
+    for name, old_time, new_time, ratio in rows:
+        flag = '  <-- slower' if name in regressions else ''
+        print(f"{name:60s} {format_time(old_time)} {format_time(new_time)}"
+              f"  {ratio:5.2f}{flag}")
+    print(f"{len(regressions)} of {len(rows)} benchmarks slower than "
+          f"{threshold:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description="Compare two benchmark result files")
+    parser.add_argument('baseline', help="Result file to compare against")
+    parser.add_argument('new', help="New result file")
+    parser.add_argument('--threshold', type=float, default=1.1,
+            help="Slowdown ratio counted as a regression (default 1.1)")
+    parser.add_argument('--stat', default='best', choices=['best', 'median'],
+            help="Which timing to compare")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    new = load_results(args.new)
+    if baseline['suite'] != new['suite']:
+        print(f"Warning: comparing different suites "
+              f"({baseline['suite']} vs {new['suite']})")
+
+    rows, regressions = compare(baseline, new, args.threshold, args.stat)
+    print_comparison(rows, regressions, args.threshold)
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Reproducible synthetic workloads for the benchmarks. Everything takes a 
+# seed so repeated runs (and runs on different machines) see the same data.
+
+import os
+from os.path import join as pjoin
+
+import numpy as np
+import pandas as pd
+
+from helpyr.helpyr_misc import ensure_dir_exists
+from helpyr.logger import quiet_logger
+
+# Half-phi sieve sizes (mm) like the ones used in flume experiments
+SIEVE_SIZES = [0.5, 0.71, 1, 1.41, 2, 2.83, 4, 5.66, 8, 11.3, 16, 22.6, 32, 45]
+
+
+def make_directory_tree(root, n_files, depth, branching=3, extensions=('.txt', '.csv', '.png'), seed=0):
+    # Create a directory tree depth levels deep with n_files empty files 
+    # spread randomly across the leaf directories.
+    # Returns the list of file paths created.
+    rng = np.random.default_rng(seed)
+    leaf_dirs = ['']
+    for level in range(depth):
+        leaf_dirs = [pjoin(parent, f"dir_{level}_{i}")
+                for parent in leaf_dirs for i in range(branching)]
+    leaf_dirs = [pjoin(root, leaf) for leaf in leaf_dirs]
+    logger = quiet_logger()
+    for leaf in leaf_dirs:
+        ensure_dir_exists(leaf, logger=logger)
+
+    filepaths = []
+    dir_ids = rng.integers(len(leaf_dirs), size=n_files)
+    ext_ids = rng.integers(len(extensions), size=n_files)
+    for i, (dir_id, ext_id) in enumerate(zip(dir_ids, ext_ids)):
+        filepath = pjoin(leaf_dirs[dir_id], f"file_{i}{extensions[ext_id]}")
+        open(filepath, 'w').close()
+        filepaths.append(filepath)
+    return filepaths
+
+def make_text_file(filepath, n_rows, n_cols=10, seed=0):
+    # Write a whitespace-delimited text file with a header row and an index 
+    # column, the layout DataLoader.load_txt expects by default.
+    # Returns the file size in bytes.
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(rng.random((n_rows, n_cols)) * 100,
+            columns=[f"col_{i}" for i in range(n_cols)])
+    data.index.name = 'row'
+    data.to_csv(filepath, sep=' ', float_format='%.4f')
+    return os.path.getsize(filepath)
+
+def make_numeric_text_file(filepath, n_rows, n_cols=10, seed=0):
+    # Write a whitespace-delimited text file with numbers only, for 
+    # DataLoader.load_txt_np. Returns the file size in bytes.
+    rng = np.random.default_rng(seed)
+    np.savetxt(filepath, rng.random((n_rows, n_cols)) * 100, fmt='%.4f')
+    return os.path.getsize(filepath)
+
+def make_sieve_masses(n_rows, sizes=SIEVE_SIZES, null_fraction=0.01, empty_fraction=0.1, seed=0):
+    # Make a dataframe of sieve masses (rows x size classes). Each sample is 
+    # a lognormal-ish distribution with random median and spread, some 
+    # empty size classes, and some rows with null values.
+    rng = np.random.default_rng(seed)
+    psi = np.log2(sizes)
+    median = rng.uniform(psi[2], psi[-3], size=(n_rows, 1))
+    spread = rng.uniform(0.5, 2, size=(n_rows, 1))
+    masses = np.exp(-0.5 * ((psi - median) / spread)**2) * \
+            rng.uniform(50, 500, size=(n_rows, 1))
+    masses[rng.random(masses.shape) < empty_fraction] = 0
+    masses[rng.random(n_rows) < null_fraction, 0] = np.nan
+    return pd.DataFrame(masses, columns=sizes)
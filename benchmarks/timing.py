@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import json
+import platform
+import statistics
+import timeit
+import tracemalloc
+from time import asctime
+
+import numpy as np
+
+
+def time_call(function, number=None, repeat=5, min_time=0.2):
+    # Time a function that takes no arguments. If number is None, the number 
+    # of calls per repeat is picked so each repeat takes at least min_time.
+    # Returns a dict of per-call times in seconds.
+    timer = timeit.Timer(function)
+    if number is None:
+        number = 1
+        while timer.timeit(number) < min_time:
+            number *= 10
+    per_call = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+            'number': number,
+            'repeat': repeat,
+            'best': min(per_call),
+            'median': statistics.median(per_call),
+            }
+
+def measure_peak_memory(function):
+    # Run function once and return the peak memory (bytes) allocated during 
+    # the call. numpy and pandas buffers are included since numpy reports 
+    # its allocations to tracemalloc.
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def format_time(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:8.3f} {unit}"
+    return f"{seconds / 1e-9:8.3f} ns"
+
+
+class BenchmarkResults:
+    """ 
+
+    Collects benchmark timings by name and saves them to a JSON file along 
+    with some info about the machine and library versions.
+
+    """
+
+    def __init__(self, suite, verbose=True):
+        self.suite = suite
+        self.verbose = verbose
+        self.results = {} # {name : stats dict}
+
+    def add(self, name, stats):
+        self.results[name] = stats
+        if self.verbose:
+            extra = ''.join(f"  {key}={value}" for key, value in stats.items()
+                    if key not in ('number', 'repeat', 'best', 'median'))
+            print(f"{name:60s} {format_time(stats['best'])}{extra}")
+
+    def time(self, name, function, **kwargs):
+        # Time function and record the result. kwargs go to time_call.
+        stats = time_call(function, **kwargs)
+        self.add(name, stats)
+        return stats
+
+    def save(self, filepath):
+        output = {
+                'suite': self.suite,
+                'date': asctime(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.platform(),
+                'results': self.results,
+                }
+        with open(filepath, 'w') as json_file:
+            json.dump(output, json_file, indent=2, sort_keys=True)
+        if self.verbose:
+            print(f"Saved {len(self.results)} results to {filepath}")
+
+def load_results(filepath):
+    with open(filepath, 'r') as json_file:
+        return json.load(json_file)
@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
 
+from helpyr.shared_data import SharedData
+from helpyr.shared_data import attach
+
 def calc_Di(data, target_Di=50):
     # Calculate the Di values for a dataframe of sieve masses
     # data should be a dataframe of raw masses per size class (size sorted 
@@ -10,60 +17,600 @@ def calc_Di(data, target_Di=50):
     # 
     # returns series
 
+    target_Di = _parse_target(target_Di)
+    name = f"D{target_Di}"
+
+    Di = calc_Di_array(data.to_numpy(dtype=float),
+            data.columns.to_numpy(dtype=float), [target_Di])
+
+    return pd.Series(Di[:, 0], index=data.index, name=name)
+
+def calc_Dis(data, targets=(16, 50, 84, 90)):
+    # Calculate several Di values at once for a dataframe of sieve masses
+    # data should be a dataframe of raw masses per size class (size sorted 
+    # smallest to largest)
+    # targets is a sequence of integers between 0 and 100 (strings like 'D50' 
+    # okay too)
+    #
+    # The cumulative distribution is computed once and all the targets are 
+    # located on it together, so this is much cheaper than calling calc_Di 
+    # for each target.
+    #
+    # returns dataframe with one column per target
+    targets = [_parse_target(target_Di) for target_Di in targets]
+    names = [f"D{target_Di}" for target_Di in targets]
+
+    Dis = calc_Di_array(data.to_numpy(dtype=float),
+            data.columns.to_numpy(dtype=float), targets)
+
+    return pd.DataFrame(Dis, index=data.index, columns=names)
+
+def calc_Di_chunked(chunks, target_Di=50, sizes=None, out=None):
+    # Calculate Di values for data too big to hold in memory all at once
+    # chunks is an iterable of row blocks of sieve masses, either dataframes 
+    # (e.g. from pd.read_csv(..., chunksize=n)) or 2D arrays. Every block 
+    # needs the same size classes (size sorted smallest to largest).
+    # target_Di is one target or a sequence of targets (see calc_Dis)
+    # sizes are the size classes. Taken from the dataframe columns if None.
+    # out is an optional preallocated output array with a row for every 
+    # data row (and a column per target if target_Di is a sequence)
+    #
+    # Working memory is reused between chunks, so peak memory depends on the 
+    # chunk size rather than the total number of rows.
+    #
+    # returns array of Di values in the same row order as the chunks
+    is_scalar = isinstance(target_Di, (str, int, np.integer))
+    targets = [target_Di] if is_scalar else target_Di
+
+    workspace = None
+    results = [] # only used if out is None
+    row = 0
+    for chunk in chunks:
+        if isinstance(chunk, pd.DataFrame):
+            if sizes is None:
+                sizes = chunk.columns.to_numpy(dtype=float)
+            values = chunk.to_numpy(dtype=float)
+        else:
+            values = np.asarray(chunk, dtype=float)
+        assert sizes is not None, "sizes must be provided for array chunks"
+
+        n_rows, n_classes = values.shape
+        if workspace is None or \
+                not workspace.fits(n_rows, n_classes, len(targets)):
+            # First chunk or a bigger chunk than before
+            workspace = DiWorkspace(n_rows, n_classes, len(targets))
+
+        if out is None:
+            Dis = calc_Di_array(values, sizes, targets, workspace=workspace)
+            results.append(Dis)
+        else:
+            out_rows = out[row:row + n_rows]
+            if is_scalar:
+                out_rows = out_rows[:, np.newaxis]
+            calc_Di_array(values, sizes, targets,
+                    out=out_rows, workspace=workspace)
+        row += n_rows
+
+    if out is None:
+        out = np.concatenate(results) if results \
+                else np.empty((0, len(targets)))
+        if is_scalar:
+            out = out[:, 0]
+    else:
+        assert row == len(out), \
+                f"out has {len(out)} rows but the chunks had {row} rows"
+    return out
+
+def calc_Di_parallel(data, target_Di=50, n_workers=None, n_partitions=None, use_threads=False):
+    # Calculate Di values using a pool of workers
+    # data should be a dataframe of raw masses per size class (size sorted 
+    # smallest to largest)
+    # target_Di is one target or a sequence of targets (see calc_Dis)
+    # n_workers is the pool size (defaults to the cpu count)
+    # n_partitions is the number of row blocks to split the data into 
+    # (defaults to n_workers)
+    # use_threads picks a thread pool instead of a process pool. NumPy 
+    # releases the GIL for most of the kernel, so threads avoid the process 
+    # startup cost for medium sized data.
+    #
+    # For process pools, the masses and the output are put in shared memory 
+    # blocks so the workers read and write them directly instead of pickling 
+    # the arrays back and forth.
+    #
+    # returns series for a single target or dataframe for several targets
+    is_scalar = isinstance(target_Di, (str, int, np.integer))
+    targets = [_parse_target(t) for t in
+            ([target_Di] if is_scalar else target_Di)]
+    names = [f"D{t}" for t in targets]
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    n_partitions = n_workers if n_partitions is None else n_partitions
+    masses = data.to_numpy(dtype=float)
+    sizes = data.columns.to_numpy(dtype=float)
+    n_rows = masses.shape[0]
+
+    bounds = np.linspace(0, n_rows, max(1, n_partitions) + 1).astype(int)
+    partitions = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start]
+
+    if use_threads:
+        Dis = np.empty((n_rows, len(targets)))
+        def run_partition(partition):
+            start, stop = partition
+            calc_Di_array(masses[start:stop], sizes, targets,
+                    out=Dis[start:stop])
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            list(pool.map(run_partition, partitions))
+    else:
+        Dis = _calc_Di_shared(masses, sizes, targets, partitions, n_workers)
+
+    if is_scalar:
+        return pd.Series(Dis[:, 0], index=data.index, name=names[0])
+    return pd.DataFrame(Dis, index=data.index, columns=names)
+
+def _calc_Di_shared(masses, sizes, targets, partitions, n_workers):
+    # Run calc_Di_array over row partitions in a process pool with the input 
+    # and output arrays in shared memory
+    n_rows, n_classes = masses.shape
+    with SharedData() as shared:
+        masses_handle = shared.share_array(masses)
+        Dis_handle = shared.empty_array((n_rows, len(targets)), float)
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [shared.submit(pool, _calc_Di_shared_worker, 
+                masses_handle, Dis_handle, sizes, targets, start, stop)
+                for start, stop in partitions]
+            for future in futures:
+                # Raise any worker errors
+                future.result()
+
+        with attach(Dis_handle) as shared_Dis:
+            Dis = shared_Dis.copy()
+    return Dis
+
+def _calc_Di_shared_worker(masses_handle, Dis_handle, sizes, targets, start, 
+        stop):
+    # Worker side of _calc_Di_shared. Attaches to the shared blocks and 
+    # computes one partition in place.
+    with attach(masses_handle) as masses, attach(Dis_handle) as Dis:
+        calc_Di_array(masses[start:stop], sizes, targets, out=Dis[start:stop])
+
+def _parse_target(target_Di):
+    # Convert a target like 'D50' or 50 to an integer percentile
     if isinstance(target_Di, str):
         target_Di = int(target_Di[1:])
 
     assert(0 < target_Di < 100)
-    target = target_Di/100
-    name = f"D{target_Di}"
+    return target_Di
 
-    notnull_idx = data.notnull().all(axis=1)
-    raw_data = data
-    data = data.loc[notnull_idx, :]
-    # Calculate cumulative curve and normalize
-    cumsum = data.cumsum(axis=1)
-    notnull_fractional = cumsum.divide(cumsum.iloc[:, -1], axis=0)
 
-    # Make sure the target falls between datapoints on the distribution
-    fines_okay = (notnull_fractional < target).any(axis=1)
-    coarse_okay = (notnull_fractional > target).any(axis=1)
-    okay_rows = fines_okay & coarse_okay
-    fractional = notnull_fractional.loc[okay_rows, :]
+class DiWorkspace:
+    """ Preallocated working arrays for calc_Di_array.
 
-    # interpolate the percentile
-    # I CANNOT find a cleaner way to do this... Definitely not in Pandas.
-    np_frac = fractional.values
-    np_cols = fractional.columns.values
+    Reusing a workspace between calls (e.g. for every chunk of a big 
+    dataset) means the kernel doesn't allocate anything. Holds enough space 
+    for up to n_rows rows.
+
+    """
+
+    def __init__(self, n_rows, n_classes, n_targets):
+        self.n_rows = n_rows
+        self.n_classes = n_classes
+        self.n_targets = n_targets
+
+        matrix = (n_rows, n_targets)
+        self.fractions = np.empty((n_rows, n_classes))
+        self.totals = np.empty((n_rows, 1))
+        self.row_offsets = np.arange(n_rows)[:, np.newaxis] * n_classes
+        self.n_lesser = np.empty(matrix, dtype=np.intp)
+        self.n_not_greater = np.empty(matrix, dtype=np.intp)
+        self.lower_idx = np.empty(matrix, dtype=np.intp)
+        self.upper_idx = np.empty(matrix, dtype=np.intp)
+        self.flat_idx = np.empty(matrix, dtype=np.intp)
+        self.lower_frac = np.empty(matrix)
+        self.upper_frac = np.empty(matrix)
+        self.lower_psi = np.empty(matrix)
+        self.upper_psi = np.empty(matrix)
+        self.mask = np.empty(matrix, dtype=bool)
+        self.mask2 = np.empty(matrix, dtype=bool)
+
+    def fits(self, n_rows, n_classes, n_targets):
+        return n_rows <= self.n_rows and n_classes == self.n_classes \
+                and n_targets == self.n_targets
+
+    def rows(self, n_rows):
+        # Views of the working arrays trimmed to n_rows rows. Row slices of C 
+        # ordered arrays are still contiguous.
+        names = ['fractions', 'totals', 'row_offsets', 'n_lesser', 
+                 'n_not_greater', 'lower_idx', 'upper_idx', 'flat_idx', 
+                 'lower_frac', 'upper_frac', 'lower_psi', 'upper_psi', 
+                 'mask', 'mask2']
+        return [getattr(self, name)[:n_rows] for name in names]
+
+
+def calc_Di_array(masses, sizes, targets, out=None, workspace=None):
+    # Calculate Di values for a 2D array of sieve masses
+    # masses is a (rows x size classes) array of raw masses (size sorted 
+    # smallest to largest)
+    # sizes is the array of size classes
+    # targets is a sequence of integers between 0 and 100 (strings like 'D50' 
+    # okay too)
+    # out is an optional (rows x targets) float array for the output
+    # workspace is an optional DiWorkspace to reuse between calls
+    #
+    # Rows with null values, no mass, or a target that doesn't fall between 
+    # points on the cumulative curve get NaN. Targets exactly on the curve 
+    # return the matching size class. Everything else is interpolated 
+    # linearly in log2 (psi) space.
+    #
+    # returns (rows x targets) array
+    masses = np.asarray(masses, dtype=float)
+    n_rows, n_classes = masses.shape
+    n_targets = len(targets)
+    if workspace is None or not workspace.fits(n_rows, n_classes, n_targets):
+        workspace = DiWorkspace(n_rows, n_classes, n_targets)
+
+    fractions = cumulative_fractions(masses,
+            out=workspace.fractions[:n_rows], totals=workspace.totals[:n_rows])
+    return interpolate_Di_array(fractions, sizes, targets,
+            out=out, workspace=workspace)
+
+def cumulative_fractions(masses, out=None, totals=None):
+    # Calculate the normalized cumulative curve (fraction finer) for a 2D 
+    # array of sieve masses
+    # Rows with null values or zero total mass end up all NaN
+    # out is an optional array the same shape as masses
+    # totals is an optional (rows x 1) working array
+    masses = np.asarray(masses, dtype=float)
+    fractions = np.cumsum(masses, axis=1, out=out)
+    if totals is None:
+        totals = fractions[:, -1:].copy()
+    else:
+        np.copyto(totals, fractions[:, -1:])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.divide(fractions, totals, out=fractions)
+    return fractions
+
+def interpolate_Di_array(fractions, sizes, targets, out=None, workspace=None, psi=False):
+    # Interpolate Di values on precomputed cumulative curves (see 
+    # cumulative_fractions and calc_Di_array)
+    # fractions is a (rows x size classes) array of normalized cumulative 
+    # curves
+    # psi=True returns log2 of the Di values instead (skips the conversion 
+    # back to mm)
+    #
+    # returns (rows x targets) array
+    sizes = np.asarray(sizes, dtype=float)
+    targets = np.array([_parse_target(t) for t in targets]) / 100
+
+    n_rows, n_classes = fractions.shape
+    n_targets = len(targets)
+    if out is None:
+        out = np.empty((n_rows, n_targets))
+    if workspace is None or not workspace.fits(n_rows, n_classes, n_targets):
+        workspace = DiWorkspace(n_rows, n_classes, n_targets)
 
-    np_equal = np_frac == target
+    (_, _, row_offsets, n_lesser, n_not_greater, lower_idx, 
+            upper_idx, flat_idx, lower_frac, upper_frac, lower_psi, 
+            upper_psi, okay, equal) = workspace.rows(n_rows)
+    psi_sizes = np.log2(sizes)
 
-    np_lesser = np_frac < target
-    np_rlesser = np.roll(np_lesser, -1, axis=1)
-    np_lower = np_lesser & ~np_rlesser # find True w/ False to right
+    # Find where each target falls on each curve. The curves are sorted, so 
+    # counting the points below (or not above) a target is the same as a 
+    # searchsorted with side='left' (or 'right') on each row. All the targets 
+    # are handled in a single pass over the size classes. NaN curves compare 
+    # False everywhere and count as zero.
+    n_lesser.fill(0)
+    n_not_greater.fill(0)
+    for i in range(n_classes):
+        column = fractions[:, i, np.newaxis]
+        np.less(column, targets, out=okay)
+        n_lesser += okay
+        np.less_equal(column, targets, out=okay)
+        n_not_greater += okay
 
-    np_greater = np_frac > target
-    np_rgreater = np.roll(np_greater, 1, axis=1)
-    np_upper = np_greater & ~np_rgreater # find True w/ False to left
+    # Bracketing size classes. Clipped so bad rows still index safely.
+    np.subtract(n_lesser, 1, out=lower_idx)
+    np.clip(lower_idx, 0, n_classes - 1, out=lower_idx)
+    np.minimum(n_not_greater, n_classes - 1, out=upper_idx)
 
-    lower_frac = np_frac[np_lower]
-    upper_frac = np_frac[np_upper]
-    lower = np_cols[np.argmax(np_lower, axis=1)] # lower size classes
-    upper = np_cols[np.argmax(np_upper, axis=1)] # upper size classes
-    equal = np_cols[np.argmax(np_equal, axis=1)] # equal size class
-    equal_rows = np_equal.any(axis=1)
+    # Gather the bracketing fractions (take_along_axis without the copies)
+    flat_fractions = np.ascontiguousarray(fractions).reshape(-1)
+    np.add(lower_idx, row_offsets, out=flat_idx)
+    np.take(flat_fractions, flat_idx, out=lower_frac)
+    np.add(upper_idx, row_offsets, out=flat_idx)
+    np.take(flat_fractions, flat_idx, out=upper_frac)
+    np.take(psi_sizes, lower_idx, out=lower_psi)
+    np.take(psi_sizes, upper_idx, out=upper_psi)
 
-    lower_psi = np.log2(lower)
-    upper_psi = np.log2(upper)
+    # interpolate the percentile
+    # Di_psi = lower_psi + (target - lower_frac) * (upper_psi - lower_psi) /
+    #                      (upper_frac - lower_frac)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.subtract(targets, lower_frac, out=out)
+        np.subtract(upper_psi, lower_psi, out=upper_psi)
+        np.multiply(out, upper_psi, out=out)
+        np.subtract(upper_frac, lower_frac, out=upper_frac)
+        np.divide(out, upper_frac, out=out)
+        np.add(lower_psi, out, out=out)
+        if not psi:
+            np.power(2, out, out=out)
 
-    Di_psi = lower_psi + (target - lower_frac) * (upper_psi - lower_psi) /\
-                        (upper_frac - lower_frac)
-    Di = 2**Di_psi
-    Di[equal_rows] = equal[equal_rows]
+    # Targets exactly on the curve use the matching size class
+    np.greater(n_not_greater, n_lesser, out=equal)
+    np.minimum(n_lesser, n_classes - 1, out=lower_idx)
+    np.take(psi_sizes if psi else sizes, lower_idx, out=lower_psi)
+    np.copyto(out, lower_psi, where=equal)
 
-    # Add the null values back in to make the array the same size
-    notnull_fractional.loc[okay_rows, name] = Di
-    out = pd.Series(index=raw_data.index, name=name)
-    out.loc[notnull_idx] = notnull_fractional[name]
+    # Make sure the target falls between datapoints on the distribution
+    np.greater(n_lesser, 0, out=okay)
+    np.less(n_not_greater, n_classes, out=equal)
+    np.logical_and(okay, equal, out=okay)
+    np.logical_not(okay, out=okay)
+    np.copyto(out, np.nan, where=okay)
 
     return out
 
+
+class GrainSizeStats:
+    """ Compact array-backed table of grain size statistics.
+
+    Holds one row per sample and one column per statistic in a single 2D 
+    array. Columns can be pulled out by name (stats['sorting']) or the whole 
+    table converted with to_dataframe.
+
+    """
+
+    def __init__(self, values, names, index=None):
+        self.values = values
+        self.names = tuple(names)
+        self.index = index
+        self._columns = {name: i for i, name in enumerate(self.names)}
+
+    def __getitem__(self, name):
+        return self.values[:, self._columns[name]]
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.values, index=self.index, columns=self.names)
+
+
+class GrainSizeDistribution:
+    """ Grain size distribution statistics for sieve data.
+
+    Builds the normalized cumulative curve (fraction finer) once and computes 
+    everything else from it in vectorized passes: Di percentiles, Folk & 
+    Ward graphic statistics, and fraction finer curves. The curve and the 
+    percentiles are cached, so repeated queries on the same data are free.
+
+    Statistics are calculated on the psi scale (log2 of size in mm). The 
+    sorting, skewness, and kurtosis keep their usual Folk & Ward meaning 
+    (e.g. positive skewness means an excess of fines).
+
+    """
+
+    # Percentiles needed for the Folk & Ward statistics
+    folk_ward_targets = (5, 16, 25, 50, 75, 84, 95)
+    stat_names = ('mean_psi', 'Dg', 'sorting', 'skewness', 'kurtosis')
+
+    def __init__(self, data):
+        # data should be a dataframe of raw masses per size class (size 
+        # sorted smallest to largest)
+        self.index = data.index
+        self.sizes = data.columns.to_numpy(dtype=float)
+        self.psi_sizes = np.log2(self.sizes)
+        self._masses = data.to_numpy(dtype=float)
+        self._fractions = None
+        self._psi_cache = {} # {target: psi array}
+        self._mm_cache = {} # {target: mm array}
+        self._stats = None
+
+    @classmethod
+    def from_fractions(cls, fractions, sizes, index=None):
+        # Build from an already normalized cumulative curve (e.g. one cached 
+        # to disk) without the raw masses
+        gsd = cls.__new__(cls)
+        gsd.index = pd.RangeIndex(len(fractions)) if index is None else index
+        gsd.sizes = np.asarray(sizes, dtype=float)
+        gsd.psi_sizes = np.log2(gsd.sizes)
+        gsd._masses = None
+        gsd._fractions = fractions
+        gsd._psi_cache = {}
+        gsd._mm_cache = {}
+        gsd._stats = None
+        return gsd
+
+    @property
+    def fractions(self):
+        # Normalized cumulative curve. Computed on first use, then cached.
+        if self._fractions is None:
+            self._fractions = cumulative_fractions(self._masses)
+            # Don't need the raw masses anymore
+            self._masses = None
+        return self._fractions
+
+    def _get_Di(self, targets, psi=True):
+        # Get Di values in psi (or in mm if psi is False) for the targets, 
+        # computing only the ones that aren't cached yet. The mm values are 
+        # interpolated directly like calc_Di so exact size class matches stay 
+        # exact. Returns (rows x targets) array.
+        targets = [_parse_target(t) for t in targets]
+        cache = self._psi_cache if psi else self._mm_cache
+        missing = [t for t in dict.fromkeys(targets) if t not in cache]
+        if missing:
+            values = interpolate_Di_array(self.fractions, self.sizes, missing,
+                    psi=psi)
+            for i, target in enumerate(missing):
+                cache[target] = values[:, i]
+        return np.column_stack([cache[t] for t in targets])
+
+    def Di(self, targets=(16, 50, 84, 90)):
+        # Get Di values (mm) for the targets. Returns dataframe with one 
+        # column per target. Identical to calc_Dis.
+        targets = [_parse_target(t) for t in targets]
+        return pd.DataFrame(self._get_Di(targets, psi=False),
+                index=self.index, columns=[f"D{t}" for t in targets])
+
+    def stats(self):
+        # Calculate the Folk & Ward graphic statistics for every sample
+        # Returns GrainSizeStats with columns:
+        #   mean_psi = graphic mean in psi
+        #   Dg = graphic (geometric) mean size in mm
+        #   sorting = inclusive graphic standard deviation
+        #   skewness = inclusive graphic skewness
+        #   kurtosis = graphic kurtosis
+        if self._stats is not None:
+            return self._stats
+
+        psi = self._get_Di(self.folk_ward_targets)
+        p5, p16, p25, p50, p75, p84, p95 = psi.T
+
+        values = np.empty((psi.shape[0], len(self.stat_names)))
+        mean_psi, Dg, sorting, skewness, kurtosis = values.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.divide(p16 + p50 + p84, 3, out=mean_psi)
+            np.power(2, mean_psi, out=Dg)
+            inner = p84 - p16
+            outer = p95 - p5
+            np.add(inner / 4, outer / 6.6, out=sorting)
+            np.add((2*p50 - p16 - p84) / (2*inner),
+                    (2*p50 - p5 - p95) / (2*outer), out=skewness)
+            np.divide(outer, 2.44 * (p75 - p25), out=kurtosis)
+
+        self._stats = GrainSizeStats(values, self.stat_names, self.index)
+        return self._stats
+
+    def fraction_finer(self, sizes=None):
+        # Get the fraction finer than each size for every sample
+        # sizes defaults to the sieve size classes (i.e. the cumulative curve 
+        # itself). Other sizes are interpolated linearly in psi.
+        # Returns dataframe with a column per size.
+        if sizes is None:
+            return pd.DataFrame(self.fractions, index=self.index,
+                    columns=self.sizes)
+
+        sizes = np.asarray(sizes, dtype=float)
+        query_psi = np.log2(sizes)
+        psi_sizes = self.psi_sizes
+        fractions = self.fractions
+
+        # All samples share the size classes, so the brackets and weights are 
+        # found once for all rows
+        upper = np.clip(np.searchsorted(psi_sizes, query_psi), 1,
+                len(psi_sizes) - 1)
+        lower = upper - 1
+        weight = (query_psi - psi_sizes[lower]) / \
+                (psi_sizes[upper] - psi_sizes[lower])
+        weight = np.clip(weight, 0, 1)
+        finer = (1 - weight) * fractions[:, lower] + \
+                weight * fractions[:, upper]
+
+        # Nothing is finer than the smallest class. Everything is finer than 
+        # the largest.
+        finer[:, query_psi < psi_sizes[0]] = 0
+        finer[:, query_psi > psi_sizes[-1]] = 1
+        finer[np.isnan(fractions[:, -1])] = np.nan
+
+        return pd.DataFrame(finer, index=self.index, columns=sizes)
+
+
+class IncrementalDiCalculator:
+    """ Keeps Di values up to date for a growing sieve dataset.
+
+    Meant for live data where new sieve rows keep getting appended to a 
+    dataframe. Each update only calculates the rows that were added since 
+    the last update (plus any rows flagged as changed), so the cost is 
+    proportional to the new data rather than the whole history. update 
+    returns the Di values of those rows; the results property has every 
+    row.
+
+    The dataframe is assumed to be append-only: existing rows keep their 
+    position. Rows whose values change must be passed as changed (or 
+    flagged with invalidate) to be recalculated.
+
+    """
+
+    def __init__(self, targets=(16, 50, 84, 90)):
+        self.targets = [_parse_target(t) for t in targets]
+        self.names = [f"D{t}" for t in self.targets]
+        self.sizes = None
+        self.n_rows = 0
+        self._Dis = np.empty((0, len(self.targets)))
+        self._index = None
+        self._invalid = []
+        self._workspace = None
+
+    def invalidate(self, labels):
+        # Flag rows (by index label) to be recalculated on the next update
+        self._invalid.extend(labels)
+
+    def update(self, data, changed=None):
+        # Calculate the Di values for rows added since the last update
+        # data should be the whole accumulated dataframe of raw masses per 
+        # size class (size sorted smallest to largest)
+        # changed is an optional list of index labels for existing rows whose 
+        # values have changed
+        #
+        # returns dataframe of the Di values for only the new and changed 
+        # rows. Use results for all the rows.
+        sizes = data.columns.to_numpy(dtype=float)
+        if self.sizes is None:
+            self.sizes = sizes
+        assert np.array_equal(sizes, self.sizes), \
+                "Size classes changed between updates"
+        n_total = len(data)
+        assert n_total >= self.n_rows, \
+                f"Data has fewer rows ({n_total}) than already processed ({self.n_rows})"
+
+        # Recalculate changed rows
+        labels = self._invalid + ([] if changed is None else list(changed))
+        self._invalid = []
+        positions = np.empty(0, dtype=np.intp)
+        if labels:
+            positions = data.index.get_indexer(labels)
+            assert (positions >= 0).all(), "Unknown labels in changed rows"
+            positions = np.unique(positions[positions < self.n_rows])
+            self._Dis[positions] = self._calc(data.iloc[positions])
+
+        # Calculate the new rows
+        if n_total > self.n_rows:
+            self._reserve(n_total)
+            self._calc(data.iloc[self.n_rows:], out=self._Dis[self.n_rows:n_total])
+
+        updated = np.concatenate([positions, np.arange(self.n_rows, n_total)])
+        self.n_rows = n_total
+        self._index = data.index
+        # Fancy indexing copies just the updated rows
+        return pd.DataFrame(self._Dis[updated], index=data.index[updated],
+                columns=self.names)
+
+    @property
+    def results(self):
+        # Copy of the Di values for every processed row
+        index = self._index if self._index is not None else pd.RangeIndex(0)
+        return pd.DataFrame(self._Dis[:self.n_rows].copy(), index=index,
+                columns=self.names)
+
+    def _calc(self, rows, out=None):
+        masses = rows.to_numpy(dtype=float)
+        n_rows, n_classes = masses.shape
+        workspace = self._workspace
+        if workspace is None or \
+                not workspace.fits(n_rows, n_classes, len(self.targets)):
+            # Keep the biggest workspace around for the next update
+            workspace = DiWorkspace(n_rows, n_classes, len(self.targets))
+            self._workspace = workspace
+        return calc_Di_array(masses, self.sizes, self.targets, out=out,
+                workspace=workspace)
+
+    def _reserve(self, n_rows):
+        # Grow the results buffer geometrically so appends are amortized
+        capacity = self._Dis.shape[0]
+        if n_rows <= capacity:
+            return
+        new_capacity = max(n_rows, 2 * capacity)
+        Dis = np.empty((new_capacity, len(self.targets)))
+        Dis[:self.n_rows] = self._Dis[:self.n_rows]
+        self._Dis = Dis
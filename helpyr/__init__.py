@@ -1,10 +1,29 @@
 #!/usr/bin/env python3
 name = "helpyr"
 
-#import helpyr.crawler
-#import helpyr.data_loading
-#import helpyr.Di_calculator
-#import helpyr.helpyr_misc
-#import helpyr.image_concat
-#import helpyr.image_splitter
-#import helpyr.logger
+# Submodules are imported on first attribute access (PEP 562), so 
+# 'import helpyr' stays cheap and e.g. helpyr.kwarg_checker doesn't pull in 
+# pandas or matplotlib.
+from importlib import import_module as _import_module
+
+_submodules = (
+        'crawler',
+        'data_loading',
+        'Di_calculator',
+        'figure_helpyr',
+        'helpyr_misc',
+        'image_concat',
+        'image_pipeline',
+        'image_splitter',
+        'kwarg_checker',
+        'logger',
+        'shared_data',
+        )
+
+def __getattr__(attr_name):
+    if attr_name in _submodules:
+        return _import_module(f"{__name__}.{attr_name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {attr_name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
@@ -63,11 +63,13 @@ class Crawler:
         self._write_log(target_dirs, local_indent=1, verbose=verbose)
 
 
-    def collect_names(self, verbose_file_list=True):
+    def collect_names(self, verbose_file_list=True, max_listed=None):
         # Collect the target names. Stores the list internally, does not return 
         # a value. verbose_file_list controls whether the files found should be 
         # printed out to the log file. The list can get very long and clutter 
-        # up the log file or start hogging too much hard drive space.
+        # up the log file or start hogging too much hard drive space, so 
+        # max_listed limits how many names are written (defaults to the 
+        # logger's max_items).
         self.file_list = []
         n_files_target = 1
         def print_i(i, n_found):
@@ -117,22 +119,25 @@ class Crawler:
                 self.file_list += filepaths
 
         if verbose_file_list:
-            self._write_log(self.file_list, local_indent=1, verbose=verbose_file_list)
+            self._write_log(self.file_list, local_indent=1,
+                    verbose=verbose_file_list, max_items=max_listed)
 
         n_files = len(self.file_list)
         self._write_log([f"Names collected. {n_files} files found"])
 
 
-    def get_target_files(self, target_names=[], target_dirs=[], verbose_file_list=True):
+    def get_target_files(self, target_names=[], target_dirs=[], verbose_file_list=True, max_listed=None):
         # returns the list of collected names. meant to simplify the use of the 
         # crawler when it plays a smaller role in your code.
         # * or ? for wildcards
         # target_dirs controls what directory the files should be in
         # verbose_file_list controls whether the file list will be printed out 
         # to the terminal
+        # max_listed limits how many of the file names are logged
         self.set_target_names(target_names)
         self.set_target_dirs(target_dirs)
-        self.collect_names(verbose_file_list=verbose_file_list)
+        self.collect_names(verbose_file_list=verbose_file_list,
+                max_listed=max_listed)
         return self.file_list
 
     def run(self, mode='all'):
@@ -1,15 +1,18 @@
 #!/usr/bin/env python
 
 
-import pandas as pd
-from numpy import loadtxt as np_loadtxt
 import os
 import pickle
 
 import helpyr.logger as logger_module
+from helpyr.helpyr_misc import LazyModule
 from helpyr.helpyr_misc import printer
 from helpyr.helpyr_misc import ensure_dir_exists
 
+# Imported on first use
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
 class DataLoader:
 
     def __init__(self, source_dir, destination_dir=None, logger=None):
@@ -41,8 +44,8 @@ class DataLoader:
         p1 = 's' if plural else ''
         p2 = ''  if plural else 's'
         p3 = ''  if plural else 'es'
-        msg = f"Checking if pickle{p1} {names} exist{p2}..."
-        printer(msg, logger=self.logger)
+        self.logger.write("Checking if pickle%s %s exist%s...",
+                args=(p1, names, p2))
 
         dir = self.destination_dir if use_destination else self.source_dir
         format_pkl = lambda name: self.format_picklepath(name, dir) if add_path else name
@@ -50,8 +53,7 @@ class DataLoader:
 
         exists = all([isfile(format_pkl(name)) for name in lnames])
         e1 = '' if exists else 'not '
-        msg = f"Pickle{p1} do{p3} {e1}exist"
-        printer(msg, logger=self.logger)
+        self.logger.write("Pickle%s do%s %sexist", args=(p1, p3, e1))
         return exists
 
 
@@ -128,7 +130,7 @@ class DataLoader:
         filepath = self._get_filepath(filename, add_path)
 
         try:
-            data = np_loadtxt(filepath, **kwargs)
+            data = np.loadtxt(filepath, **kwargs)
         except:
             print(filename)
             raise
@@ -139,19 +141,30 @@ class DataLoader:
             return data
 
 
-    def produce_pickles(self, prepickles, add_path=True, verbose=True, overwrite=False):
+    def produce_pickles(self, prepickles, add_path=True, verbose=True, overwrite=False, Di_curves=False):
         # Pickle things so I don't have to keep rereading the original files
         # prepickles is a dictionary of {'pickle_name':data}
         # pickle_name will be used to create the filename
+        # Di_curves is True, a pickle name or a list of pickle names. Those 
+        # entries should be sieve mass dataframes (see Di_calculator); their 
+        # normalized cumulative curves are also saved next to the pickle 
+        # for load_Di_curves.
         # Returns a list of all the filepaths for the pickles produced
         #if verbose: printer("Performing pickling process...", logger=self.logger)
         destination_paths = []
         dest_dir = self.destination_dir
         target_dir = dest_dir if dest_dir is not None else self.source_dir
+        if isinstance(Di_curves, str):
+            # A single name, not a substring match
+            Di_curves = [Di_curves]
         for name in prepickles:
             pkl_path = self.format_picklepath(name, target_dir) if add_path else name
             pkl_filename = name if add_path else os.path.split(name)[1]
 
+            if Di_curves is True or (Di_curves and name in Di_curves):
+                self._produce_Di_curves(prepickles[name], pkl_path,
+                        verbose=verbose, overwrite=overwrite)
+
             if not overwrite and os.path.isfile(pkl_path):
                 if verbose:
                     printer(f"Pickle already exists (skipping): {pkl_path}", logger=self.logger)
@@ -172,6 +185,74 @@ class DataLoader:
 
         return destination_paths
 
+    def _Di_curves_dir(self, pkl_path):
+        # Directory for the cached cumulative curves of a pickle
+        return f"{os.path.splitext(pkl_path)[0]}_Di_curves"
+
+    def _produce_Di_curves(self, data, pkl_path, verbose=True, overwrite=False):
+        # Save the arrays needed for Di queries on a sieve mass dataframe:
+        #   fractions.npy = normalized cumulative curves (NaN rows for null 
+        #       or empty samples)
+        #   notnull.npy = rows without null masses
+        #   sizes.npy = size classes
+        #   index.pkl = the dataframe index
+        # fractions.npy is written last so its existence means the set is 
+        # complete.
+        from helpyr.Di_calculator import cumulative_fractions
+
+        curves_dir = self._Di_curves_dir(pkl_path)
+        fractions_path = os.path.join(curves_dir, 'fractions.npy')
+        if not overwrite and os.path.isfile(fractions_path):
+            if verbose:
+                printer(f"Di curves already exist (skipping): {curves_dir}", logger=self.logger)
+            return
+        if verbose:
+            printer(f"Saving Di curves at {curves_dir}", logger=self.logger)
+        ensure_dir_exists(curves_dir, self.logger)
+
+        sizes = data.columns.to_numpy(dtype=float)
+        np.save(os.path.join(curves_dir, 'sizes.npy'), sizes)
+        np.save(os.path.join(curves_dir, 'notnull.npy'),
+                data.notnull().all(axis=1).to_numpy())
+        with open(os.path.join(curves_dir, 'index.pkl'), mode='wb') as index_file:
+            pickle.dump(data.index, index_file)
+
+        # Calculate the curves in place in a copy of the masses
+        fractions = data.to_numpy(dtype=float, copy=True)
+        cumulative_fractions(fractions, out=fractions)
+        tmp_path = os.path.join(curves_dir, 'fractions.tmp.npy')
+        np.save(tmp_path, fractions)
+        os.replace(tmp_path, fractions_path)
+
+    def load_Di_curve_arrays(self, name, add_path=True, use_source=True, mmap_mode='r'):
+        # Load the cached Di curve arrays saved by produce_pickles
+        # use_source picks the source_dir or destination_dir like load_pickle
+        # mmap_mode is passed to np.load; the default memory maps the arrays 
+        # read only. None reads them into memory.
+        # Returns dict with 'fractions', 'notnull', 'sizes', and 'index'
+        dir = self.source_dir if use_source else self.destination_dir
+        pkl_path = self.format_picklepath(name, dir) if add_path else name
+        curves_dir = self._Di_curves_dir(pkl_path)
+
+        arrays = {}
+        for key in ['fractions', 'notnull']:
+            arrays[key] = np.load(os.path.join(curves_dir, f"{key}.npy"),
+                    mmap_mode=mmap_mode)
+        arrays['sizes'] = np.load(os.path.join(curves_dir, 'sizes.npy'))
+        with open(os.path.join(curves_dir, 'index.pkl'), mode='rb') as index_file:
+            arrays['index'] = pickle.load(index_file)
+        return arrays
+
+    def load_Di_curves(self, name, add_path=True, use_source=True, mmap_mode='r'):
+        # Load the cached Di curves as a GrainSizeDistribution. Di queries 
+        # for any percentile only interpolate on the memory mapped curves.
+        from helpyr.Di_calculator import GrainSizeDistribution
+
+        arrays = self.load_Di_curve_arrays(name, add_path=add_path,
+                use_source=use_source, mmap_mode=mmap_mode)
+        return GrainSizeDistribution.from_fractions(arrays['fractions'],
+                arrays['sizes'], index=arrays['index'])
+
     def save_txt(self, data, filename, kwargs={}, is_path=False):
         filepath = self._get_filepath(filename, is_path)
         if is_path:
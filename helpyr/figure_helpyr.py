@@ -1,23 +1,90 @@
 #!/usr/bin/env python3
 
+import os
 from os.path import join as pjoin
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from contextlib import contextmanager
+from contextlib import redirect_stdout
+from io import BytesIO
+from io import StringIO
+import hashlib
+import json
+import pickle
+from threading import BoundedSemaphore
+from threading import Lock
 
 import numpy as np
 
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib.pyplot as plt
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
 
 from helpyr import kwarg_checker
 from helpyr import helpyr_misc as hpm
 
+# pyplot is imported on first use. matplotlib loads the 3D projection itself 
+# when an axis asks for projection='3d'.
+plt = hpm.LazyModule('matplotlib.pyplot')
+
+@contextmanager
+def _file_lock(lock_path):
+    # Hold an exclusive lock on lock_path between processes. Without fcntl 
+    # only the thread lock in FigureSaver applies.
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 class FigureSaver:
     """ 
 
     Provides basic file saving functionality that I've needed in several 
     projects. Mostly provides convenient filename assembly options. 
 
+    Set 'async_workers' > 0 to save in the background. Figures are rendered 
+    to a buffer in the calling thread (matplotlib isn't thread safe) and the 
+    image encoding and file writing happen in a worker pool. At most 
+    'max_queue' figures wait in the queue; save_figure blocks when it is 
+    full. Call wait() to block until everything is written. Errors from the 
+    workers are raised by the next save_figure or wait call.
+
+    Pass a 'fingerprint' to save_figure to skip saves that would write the 
+    same file again. The fingerprint that produced each file is recorded in 
+    a manifest in figure_root_dir. If the file exists and its recorded 
+    fingerprint matches, the save is skipped. Use fingerprint='auto' to 
+    derive one from the data and styling attached to the figure.
+
+    Set 'rasterize_threshold' to rasterize lines and collections with more 
+    than that many points when saving to a vector format. Everything else 
+    (axes, text, small artists) stays vector. See also plot_decimated for 
+    reducing the points before plotting.
+
     """
 
+    manifest_filename = '.figure_manifest.json'
+
+    # Formats where dense artists are worth rasterizing
+    vector_formats = ('pdf', 'svg', 'svgz', 'eps', 'ps')
+
+    # Raster formats that can be encoded off-thread from an Agg render
+    agg_formats = ('png', 'jpg', 'jpeg', 'tif', 'tiff')
+
+    # savefig rcParams the Agg render doesn't apply. It is only used when 
+    # they have these (default) values.
+    agg_rc_defaults = {'savefig.bbox': None, 'savefig.transparent': False,
+            'savefig.facecolor': 'auto', 'savefig.edgecolor': 'auto'}
+
     def __init__(self, **kwargs):
         check = kwarg_checker.get_check_kwarg_fu(kwargs)
 
@@ -32,6 +99,20 @@ class FigureSaver:
         hpm.ensure_dir_exists(self.figure_root_dir)
         hpm.ensure_dir_exists(self.figure_dir)
 
+        async_workers = check('async_workers', 0, 'int-whole')
+        max_queue = check('max_queue', 2 * async_workers, 'int-whole')
+        self._executor = None
+        self._pending = []
+        if async_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=async_workers)
+            self._queue_slots = BoundedSemaphore(max(1, max_queue))
+
+        self.rasterize_threshold = check('rasterize_threshold', None)
+
+        self.manifest_path = pjoin(self.figure_root_dir, self.manifest_filename)
+        self._manifest = None
+        self._manifest_lock = Lock()
+
     def save_figure(self, **kwargs):
         """
 
@@ -52,6 +133,10 @@ class FigureSaver:
         'alt_subdir' is the optional alternate subdirectory to use instead of the one
         provided in the constructor.
 
+        'fingerprint' is an optional string identifying the figure contents. 
+        The save is skipped if the file already exists and was made from the 
+        same fingerprint. 'auto' uses figure_fingerprint.
+
         Any unused kwargs are passed to plt.savefig or fig.savefig
 
         """
@@ -64,6 +149,7 @@ class FigureSaver:
         sep = check('sep', '_')
         figure = check('figure', None)
         alt_subdir = check('alt_subdir', None)
+        fingerprint = check('fingerprint', None)
 
         try:
             assert( (figure_name is not None) ^ 
@@ -99,18 +185,445 @@ class FigureSaver:
             else:
                 self.logger.write(msgs)
         else:
+            if fingerprint is not None:
+                figure = plt.gcf() if figure is None else figure
+                if fingerprint == 'auto':
+                    fingerprint = figure_fingerprint(figure, 
+                            self.figure_extension, kwargs_copy)
+                if self._is_unchanged(filepath, fingerprint):
+                    msg = f"Figure unchanged, not saving {filepath}"
+                    if self.logger is None:
+                        print(msg)
+                    else:
+                        self.logger.write(msg)
+                    return
+
             msg = f"Saving figure to {filepath}"
             if self.logger is None:
                 print(msg)
             else:
                 self.logger.write(msg)
 
-            if figure is not None:
-                # Save target figure
-                figure.savefig(filepath, orientation='landscape', **kwargs_copy)
+            # Temporarily rasterize dense artists in vector outputs
+            rasterized = []
+            if self.rasterize_threshold is not None and \
+                    self.figure_extension.lower() in self.vector_formats:
+                figure = plt.gcf() if figure is None else figure
+                rasterized = _dense_artists(figure, self.rasterize_threshold)
+                for artist in rasterized:
+                    artist.set_rasterized(True)
+
+            try:
+                if self._executor is not None:
+                    # Save in the background
+                    figure = plt.gcf() if figure is None else figure
+                    self._save_async(figure, filepath, kwargs_copy, 
+                            fingerprint)
+                    return
+                elif figure is not None:
+                    # Save target figure
+                    figure.savefig(filepath, orientation='landscape', 
+                            **kwargs_copy)
+                else:
+                    # Save current figure
+                    plt.savefig(filepath, orientation='landscape', 
+                            **kwargs_copy)
+            finally:
+                for artist in rasterized:
+                    artist.set_rasterized(False)
+
+            if fingerprint is not None:
+                self._record_fingerprint(filepath, fingerprint)
+
+    def _manifest_key(self, filepath):
+        return os.path.relpath(filepath, self.figure_root_dir)
+
+    def _load_manifest(self):
+        # Read the manifest file. Returns an empty manifest if missing.
+        try:
+            with open(self.manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _is_unchanged(self, filepath, fingerprint):
+        # Check if the file exists and was made from this fingerprint
+        with self._manifest_lock:
+            if self._manifest is None:
+                self._manifest = self._load_manifest()
+            recorded = self._manifest.get(self._manifest_key(filepath))
+        return recorded == fingerprint and os.path.isfile(filepath)
+
+    def _record_fingerprint(self, filepath, fingerprint):
+        # Update the manifest file. Reload it first in case other savers 
+        # (e.g. in StableSubplots worker processes) added entries. The file 
+        # lock keeps other processes from updating it at the same time.
+        with self._manifest_lock, _file_lock(f"{self.manifest_path}.lock"):
+            manifest = self._load_manifest()
+            manifest[self._manifest_key(filepath)] = fingerprint
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=0, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+            self._manifest = manifest
+
+    def _save_async(self, figure, filepath, savefig_kwargs, fingerprint=None):
+        # Render the figure now and queue the encoding and writing
+        self._raise_errors()
+        render_job = self._render(figure, filepath, savefig_kwargs)
+        if fingerprint is None:
+            write_job = render_job
+        else:
+            def write_job():
+                render_job()
+                self._record_fingerprint(filepath, fingerprint)
+
+        self._queue_slots.acquire() # Blocks if the queue is full
+        try:
+            future = self._executor.submit(write_job)
+        except:
+            self._queue_slots.release()
+            raise
+        future.add_done_callback(lambda f: self._queue_slots.release())
+        self._pending.append(future)
+
+    def _render(self, figure, filepath, savefig_kwargs):
+        # Render the figure in this thread and return a function that 
+        # finishes the save (safe to run in another thread)
+        extension = self.figure_extension.lower()
+        rc_ok = all(plt.rcParams[key] == value 
+                for key, value in self.agg_rc_defaults.items())
+        if extension in self.agg_formats and set(savefig_kwargs) <= {'dpi'} \
+                and rc_ok:
+            # Draw with Agg and copy the pixels. Encoding happens later.
+            dpi = savefig_kwargs.get('dpi', plt.rcParams['savefig.dpi'])
+            dpi = figure.dpi if dpi in (None, 'figure') else dpi
+            original_canvas = figure.canvas
+            original_dpi = figure.dpi
+            try:
+                figure.dpi = dpi
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                canvas = FigureCanvasAgg(figure)
+                canvas.draw()
+                rgba = np.array(canvas.buffer_rgba())
+            finally:
+                figure.dpi = original_dpi
+                figure.set_canvas(original_canvas)
+            if extension in ('jpg', 'jpeg'):
+                # No alpha channel in jpegs
+                rgba = rgba[:, :, :3]
+            from matplotlib import image as mpl_image
+            def write_job():
+                mpl_image.imsave(filepath, rgba, format=extension, dpi=dpi)
+        else:
+            # Other formats or savefig options. Let savefig produce the file 
+            # contents in memory and just write it later.
+            buffer = BytesIO()
+            figure.savefig(buffer, format=extension, orientation='landscape',
+                    **savefig_kwargs)
+            def write_job():
+                with open(filepath, 'wb') as figure_file:
+                    figure_file.write(buffer.getbuffer())
+        return write_job
+
+    def _raise_errors(self):
+        # Raise the first error from finished background saves
+        still_pending = []
+        error = None
+        for future in self._pending:
+            if not future.done():
+                still_pending.append(future)
+            elif error is None and future.exception() is not None:
+                error = future.exception()
+        self._pending = still_pending
+        if error is not None:
+            raise error
+
+    def wait(self):
+        # Block until all background saves are written. Raises the first 
+        # error from the background saves, if any.
+        pending = self._pending
+        self._pending = []
+        error = None
+        for future in pending:
+            exception = future.exception()
+            if error is None and exception is not None:
+                error = exception
+        if error is not None:
+            raise error
+
+    # Alias for wait
+    flush = wait
+
+    def close(self):
+        # Wait for background saves and shut down the worker pool
+        if self._executor is not None:
+            try:
+                self.wait()
+            finally:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __getstate__(self):
+        # Copies sent to other processes save synchronously and print their 
+        # messages instead of logging them
+        state = self.__dict__.copy()
+        state['logger'] = None
+        state['_executor'] = None
+        state['_pending'] = []
+        state.pop('_queue_slots', None)
+        state['_manifest'] = None
+        state['_manifest_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._manifest_lock = Lock()
+
+
+def figure_fingerprint(figure, extension='', savefig_kwargs=None):
+    """
+
+    Return a hash of the data and common styling of the artists in a figure, 
+    plus the figure size, output format and savefig options. Figures with 
+    the same fingerprint should produce the same file. Properties not covered 
+    here (e.g. tick formatters or custom artists) are not detected; pass a 
+    fingerprint to save_figure explicitly in those cases.
+
+    """
+    from matplotlib.axes import Axes
+    from matplotlib.axis import Axis
+    from matplotlib.collections import Collection
+    from matplotlib.image import AxesImage
+    from matplotlib.legend import Legend
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
+    from matplotlib.spines import Spine
+    from matplotlib.text import Text
+
+    digest = hashlib.sha1()
+    def update(*values):
+        for value in values:
+            if isinstance(value, np.ma.MaskedArray):
+                update(np.ma.getmaskarray(value), value.filled(0))
+            elif isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                digest.update(f"{value.dtype}{value.shape}".encode())
+                digest.update(value.tobytes())
+            else:
+                digest.update(repr(value).encode())
+            digest.update(b'|')
+
+    savefig_kwargs = {} if savefig_kwargs is None else savefig_kwargs
+    update(extension, sorted(savefig_kwargs.items(), key=lambda kv: kv[0]),
+            tuple(figure.get_size_inches()), figure.dpi)
+    # Skip the axis and spine objects. Their ticks and positions are only 
+    # updated when drawing, which would change the fingerprint after the 
+    # first save. The axes limits, scales and labels cover them instead. 
+    # Likewise, only the texts and handle types of legends are hashed, not 
+    # their laid out children, and the colors of colormapped collections 
+    # come from their data, norm and colormap.
+    artists = [figure]
+    while artists:
+        artist = artists.pop()
+        if isinstance(artist, (Axis, Spine)) or not artist.get_visible():
+            continue
+        if isinstance(artist, Legend):
+            handles = getattr(artist, 'legend_handles', None)
+            if handles is None:
+                handles = artist.legendHandles # matplotlib < 3.7
+            update('Legend', [text.get_text() for text in artist.get_texts()],
+                    artist.get_title().get_text(), artist.get_frame_on(),
+                    [type(handle).__name__ for handle in handles])
+            continue
+        artists.extend(reversed(artist.get_children()))
+        update(type(artist).__name__, artist.get_zorder(), artist.get_alpha())
+        if isinstance(artist, Line2D):
+            update(np.asarray(artist.get_xydata()), artist.get_color(), 
+                    artist.get_linestyle(), artist.get_linewidth(),
+                    artist.get_marker(), artist.get_markersize())
+        elif isinstance(artist, Collection):
+            update(np.asarray(artist.get_offsets()),
+                    np.asarray(artist.get_sizes()) if hasattr(artist, 
+                        'get_sizes') else None)
+            array = artist.get_array()
+            if array is None:
+                update(np.asarray(artist.get_facecolor()),
+                        np.asarray(artist.get_edgecolor()))
             else:
-                # Save current figure
-                plt.savefig(filepath, orientation='landscape', **kwargs_copy)
+                # The mapped colors are only updated when drawing
+                norm = artist.norm
+                update(np.ma.asarray(array), type(norm).__name__,
+                        norm.vmin, norm.vmax, artist.get_cmap().name)
+            for path in artist.get_paths():
+                update(path.vertices)
+        elif isinstance(artist, AxesImage):
+            update(np.ma.asarray(artist.get_array()), artist.get_extent(),
+                    artist.get_clim(), artist.get_cmap().name)
+        elif isinstance(artist, Text):
+            update(artist.get_text(), artist.get_position(), 
+                    artist.get_fontsize(), artist.get_color(),
+                    artist.get_rotation())
+        elif isinstance(artist, Patch):
+            update(artist.get_facecolor(), artist.get_edgecolor(),
+                    artist.get_path().vertices, 
+                    artist.get_patch_transform().get_matrix())
+        elif isinstance(artist, Axes):
+            update(artist.get_position(original=True).bounds,
+                    artist.get_xlim(), 
+                    artist.get_ylim(), artist.get_xscale(),
+                    artist.get_yscale(), artist.get_xlabel(),
+                    artist.get_ylabel())
+    return digest.hexdigest()
+
+
+def _init_render_worker():
+    # Figures are only rendered to files in the worker processes
+    plt.switch_backend('Agg')
+
+def _save_pickled_figure(fig_name, fig_bytes, saving_fu_bytes):
+    # Unpickle, save, and close a figure in a worker process. Returns the 
+    # printed messages so the main process can log them.
+    saving_fu = pickle.loads(saving_fu_bytes)
+    fig = pickle.loads(fig_bytes)
+    messages = StringIO()
+    try:
+        with redirect_stdout(messages):
+            saving_fu(figure_name=fig_name, figure=fig)
+    finally:
+        plt.close(fig)
+    return messages.getvalue().splitlines()
+
+
+
+def _dense_artists(figure, threshold):
+    # Find the unrasterized lines and collections with more than 'threshold' 
+    # points
+    from matplotlib.collections import Collection
+    from matplotlib.lines import Line2D
+
+    dense = []
+    for artist in figure.findobj(lambda a: isinstance(a, (Line2D, Collection))):
+        if artist.get_rasterized():
+            continue
+        if isinstance(artist, Line2D):
+            n_points = len(artist.get_xydata())
+        else:
+            n_points = max(len(artist.get_offsets()), 
+                    sum(len(path.vertices) for path in artist.get_paths()))
+        if n_points > threshold:
+            dense.append(artist)
+    return dense
+
+def decimate_minmax(x, y, n_bins):
+    """
+
+    Reduce a line to at most 4 points per bin for plotting. x must be sorted. 
+    The x range is split into n_bins equal bins (use the pixel width of the 
+    axes) and the first, last, min and max points in each bin are kept, so 
+    the plotted line looks the same as the full resolution line. Non finite 
+    y values are dropped.
+
+    Returns the decimated x and y arrays.
+
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    assert(x.shape == y.shape and x.ndim == 1)
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if len(x) <= 4 * n_bins:
+        return x, y
+
+    # Start of each nonempty bin
+    edges = np.linspace(x[0], x[-1], n_bins + 1)
+    starts = np.unique(np.searchsorted(x, edges[:-1], side='left'))
+    starts = starts[starts < len(x)]
+    ends = np.append(starts[1:], len(x)) - 1
+    bin_ids = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, 
+        len(x))))
+
+    # Index of the first min and max in each bin
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    keep = [starts, ends]
+    for extremes in (mins, maxs):
+        hits = np.flatnonzero(y == extremes[bin_ids])
+        first_hits = np.unique(bin_ids[hits], return_index=True)[1]
+        keep.append(hits[first_hits])
+
+    keep = np.unique(np.concatenate(keep))
+    return x[keep], y[keep]
+
+def lttb(x, y, n_out):
+    """
+
+    Reduce a line to n_out points with the Largest-Triangle-Three-Buckets 
+    algorithm (Steinarsson 2013). x must be sorted. Keeps the first and last 
+    points and the point in each bucket that forms the largest triangle with 
+    the previously kept point and the average of the next bucket. Non finite 
+    y values are dropped.
+
+    Returns the decimated x and y arrays.
+
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    assert(x.shape == y.shape and x.ndim == 1)
+    assert(n_out >= 3)
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    n_points = len(x)
+    if n_points <= n_out:
+        return x, y
+
+    # Bucket edges for the points between the first and last points
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0] = 0
+    keep[-1] = n_points - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point)
+        if i < n_out - 3:
+            next_x = x[stop:edges[i + 2]].mean()
+            next_y = y[stop:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Twice the triangle areas
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + np.argmax(area)
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+def plot_decimated(ax, x, y, method='minmax', n_pixels=None, **plot_kwargs):
+    """
+
+    Plot a line with lots of points after decimating it to the pixel width of 
+    the axes. 'method' is 'minmax' (see decimate_minmax) or 'lttb'. 
+    'n_pixels' defaults to the current width of the axes in pixels at the 
+    figure dpi; pass it explicitly if saving at a higher dpi. Other kwargs 
+    are passed to ax.plot.
+
+    Returns the list of lines from ax.plot.
+
+    """
+    if n_pixels is None:
+        n_pixels = max(1, int(np.ceil(ax.get_window_extent().width)))
+
+    if method == 'minmax':
+        x, y = decimate_minmax(x, y, n_pixels)
+    elif method == 'lttb':
+        x, y = lttb(x, y, max(3, 2 * n_pixels))
+    else:
+        raise ValueError(f"Unknown decimation method {method!r}. "
+                "Use 'minmax' or 'lttb'.")
+    return ax.plot(x, y, **plot_kwargs)
 
 
 
@@ -127,16 +640,36 @@ class StableSubplots:
     code location as the plotting function. Keeps the plotting parameters in 
     one location where it is relevant rather than bloating the loop 
     initialization. 
+
+    Long runs with many figures can be kept memory bounded. With 
+    'auto_finish', a figure is saved (with 'saving_fu') and closed once all 
+    of its subplot slots are filled. This happens on the next add_subplot or 
+    finish call so the last axis can still be drawn on. With 'max_open', the 
+    least recently used figures are saved and closed when more than 
+    'max_open' figures would be open. Adding to a figure after it was closed 
+    starts a new figure with the same name.
     
     """
 
-    existing_plots = {} # {name : [fig_reference, axs_used]}
+    existing_plots = OrderedDict() # {name : [fig_reference, axs_used]}
     
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, auto_finish=False, max_open=None, 
+            saving_fu=None):
         self.logger = logger
+        self.auto_finish = auto_finish
+        self.max_open = max_open
+        self.saving_fu = saving_fu
+        self._completed = [] # Filled figures waiting to be finished
+        assert(max_open is None or max_open >= 1)
         if logger is not None:
             logger.write("Initializing a StableSubplots object")
 
+    @kwarg_checker.check_kwargs(
+            ('subplots_shape', (1,1)),
+            ('fig_kwargs', None),
+            ('ax_kwargs', None),
+            ('suptitle', ''),
+            )
     def add_subplot(self, fig_name, **kwargs):
         """
 
@@ -146,44 +679,67 @@ class StableSubplots:
         """
 
         # Get kwargs
-        check = kwarg_checker.get_check_kwarg_fu(kwargs)
-        subplots_shape = check('subplots_shape', (1,1))
-        fig_kwargs = check('fig_kwargs', {})
-        ax_kwargs = check('ax_kwargs', {})
-        suptitle = check('suptitle', '')
+        subplots_shape = kwargs['subplots_shape']
+        fig_kwargs = dict(kwargs['fig_kwargs'] or {})
+        ax_kwargs = dict(kwargs['ax_kwargs'] or {})
+        suptitle = kwargs['suptitle']
 
         nrows, ncols = subplots_shape
+        existing = StableSubplots.existing_plots
+
+        # Save and close figures that were filled by the previous calls
+        self.finish_completed()
 
         # Reuse existing figure or create new one
-        if fig_name in StableSubplots.existing_plots:
+        if fig_name in existing:
             # Use existing figure
-            fig, axs = StableSubplots.existing_plots[fig_name]
+            fig, axs = existing[fig_name]
+            existing.move_to_end(fig_name)
             ax_id = len(axs) + 1
         else:
+            # Make room for the new figure
+            if self.max_open is not None:
+                while len(existing) >= self.max_open:
+                    oldest = next(iter(existing))
+                    self._write(f"Closing least recently used figure {oldest}")
+                    self.finish(oldest, show=False)
+
             # Make new figure
             fig = plt.figure(**fig_kwargs)
             fig.suptitle(suptitle)
-            axs = np.array([])
+            axs = []
+            existing[fig_name] = [fig, axs]
             ax_id = 1
         assert(1 <= ax_id <= nrows * ncols)
 
         # Print some output
         is_new_str = 'new' if ax_id == 1 else 'existing'
-        msg = f"Creating new axis for {is_new_str} figure {fig_name}"
-        if self.logger is None:
-            print(msg)
-        else:
-            self.logger.write(msg)
+        self._write(f"Creating new axis for {is_new_str} figure {fig_name}")
 
         # Create the subplot axis
         ax = fig.add_subplot(nrows, ncols, ax_id, **ax_kwargs)
+        axs.append(ax)
 
-        # Update existing_plots
-        axs = np.append(axs, ax)
-        StableSubplots.existing_plots[fig_name] = [fig, axs]
+        if self.auto_finish and ax_id == nrows * ncols:
+            self._completed.append(fig_name)
 
         return ax
 
+    def finish_completed(self):
+        # Save and close the figures with all subplot slots filled. Only used 
+        # with auto_finish.
+        completed = self._completed
+        self._completed = []
+        for name in completed:
+            if name in StableSubplots.existing_plots:
+                self.finish(name, show=False)
+
+    def _write(self, msg):
+        if self.logger is None:
+            print(msg)
+        else:
+            self.logger.write(msg)
+
     def share_3D_scales(self, fig_name):
 
         fig, axs = StableSubplots.existing_plots[fig_name]
@@ -204,32 +760,97 @@ class StableSubplots:
             ax.set_xlim(plot_scales[0,:]), 
             ax.set_ylim(plot_scales[1,:]),
             ax.set_zlim(plot_scales[2,:]),
-    def finish(self, fig_name=None, show=True, saving_fu=None):
+    def finish(self, fig_name=None, show=True, saving_fu=None, 
+            parallel=False, n_workers=None):
+        """
+
+        Save the target figure (or all figures if fig_name is None) and then 
+        show or close them. 'saving_fu' defaults to the one given to the 
+        constructor, or else a new FigureSaver's save_figure.
+
+        Set 'parallel' to render and save the figures in a pool of 
+        'n_workers' processes. Each figure is pickled and sent to a worker, so 
+        'saving_fu' has to be picklable (the default FigureSaver.save_figure 
+        is) and gets called with the same figure_name as in serial mode. If 
+        not showing, figures are closed in this process as soon as they are 
+        sent off, so at most a few pickled figures are held in memory.
+
+        """
 
         existing = StableSubplots.existing_plots
         target_figs = list(existing.keys()) if fig_name is None else [fig_name]
+        if fig_name is None:
+            self._completed = []
+        if saving_fu is None:
+            saving_fu = self.saving_fu
         if saving_fu is None:
             saver = FigureSaver(logger=self.logger)
             saving_fu = saver.save_figure
 
         # Save the target figures
-        for name in target_figs:
-            fig, axs = existing[name]
-            if '_3d_' in name:
-                self.share_3D_scales(name)
+        if parallel:
+            self._finish_parallel(target_figs, show, saving_fu, n_workers)
+        else:
+            for name in target_figs:
+                fig, axs = existing[name]
+                if '_3d_' in name:
+                    self.share_3D_scales(name)
 
-            saving_fu(figure_name=name, figure=fig)
+                saving_fu(figure_name=name, figure=fig)
 
         # Show figures if applicable, otherwise close them
         if show:
             plt.show()
         else:
             for name in target_figs:
-                fig, axs = existing[name]
-                plt.close(fig)
+                if name in existing:
+                    fig, axs = existing[name]
+                    plt.close(fig)
 
         # Remove figures from the existing_plots dictionary
         for name in target_figs.copy():
-            del StableSubplots.existing_plots[name]
-
+            existing.pop(name, None)
 
+    def _finish_parallel(self, target_figs, show, saving_fu, n_workers):
+        # Pickle the figures and save them in a process pool
+        existing = StableSubplots.existing_plots
+        n_workers = os.cpu_count() if n_workers is None else n_workers
+        max_in_flight = 2 * n_workers
+        pending = set()
+        # Pickle saving_fu once, before any figure is closed. Lambdas and 
+        # closures raise here instead of after the figures are gone.
+        saving_fu_bytes = pickle.dumps(saving_fu)
+
+        def log_finished(done):
+            for future in done:
+                messages = future.result()
+                if self.logger is None:
+                    for msg in messages:
+                        print(msg)
+                else:
+                    self.logger.write(messages)
+
+        with ProcessPoolExecutor(max_workers=n_workers,
+                initializer=_init_render_worker) as pool:
+            for name in target_figs:
+                fig, axs = existing[name]
+                if '_3d_' in name:
+                    self.share_3D_scales(name)
+                fig_bytes = pickle.dumps(fig)
+
+                if not show:
+                    # Free the figure now. The worker has its own copy.
+                    plt.close(fig)
+                    del existing[name]
+                    del fig, axs
+
+                if len(pending) >= max_in_flight:
+                    done, pending = wait_futures(pending,
+                            return_when=FIRST_COMPLETED)
+                    log_finished(done)
+                pending.add(pool.submit(
+                    _save_pickled_figure, name, fig_bytes, saving_fu_bytes))
+                del fig_bytes
+
+            done, pending = wait_futures(pending)
+            log_finished(done)
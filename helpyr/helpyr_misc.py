@@ -1,6 +1,28 @@
 #!/usr/bin/env python3
 
 import os
+from importlib import import_module
+
+class LazyModule:
+    """ Stand-in for a module that is only imported on first attribute 
+    access. Used for heavy dependencies (pandas, matplotlib.pyplot) so 
+    importing a helpyr module stays fast, e.g.
+        plt = LazyModule('matplotlib.pyplot')
+    """
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the proxy itself
+        if self._module is None:
+            self._module = import_module(self._module_name)
+        return getattr(self._module, name)
+
+    def __repr__(self):
+        return f"<LazyModule {self._module_name}>"
+
 
 def print_entire_df(df):
     from pandas import option_context
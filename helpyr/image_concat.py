@@ -1,36 +1,136 @@
+#!/usr/bin/env python3
+
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-import scipy as sc
-from scipy import ndimage
-from scipy import misc
-
-path = '../data/testing/'
-source = path + 'strips/'
-regex = re.compile
-
-
-print("Opening files...", end='')
-files = [f for f in os.listdir(source) if os.path.isfile(os.path.join(source,f))]
-files_dict = {}
-for name in files:
-    image = sc.ndimage.imread(source + name)
-    id = regex.findall(filename)
-    files_dict
-print("Done!")
-
-"""
-print(lower.shape, upper.shape)
-
-upper[:, 0:50, :] = upper[:, 0:50, :]*0 + 255
-
-print("Concatenating...", end='')
-composite = np.concatenate([upper, lower], axis=0)
-print("Done!")
-print(composite.shape)
-
-print("Saving...", end='')
-image = sc.misc.toimage(composite, channel_axis=2)
-sc.misc.imsave(composite_file, image)
-print("Done!")
-"""
+from PIL import Image
+
+from helpyr import helpyr_misc as hpm
+
+
+class ImageConcatenator:
+    """
+
+    Stacks image strips (e.g. from ImageSplitter) back into one image. The
+    strips are ordered by the last number in their file names that matches
+    'id_regex' and stacked top to bottom.
+
+    The output size is found from the image headers, so the output is
+    allocated once as a memory mapped .npy array. The strips are decoded by
+    'n_workers' threads and each one is copied straight into its rows of the
+    output. If the output path isn't a .npy file, the assembled array is then
+    encoded with Pillow (which needs the whole image in memory once).
+
+    'overlap' is the number of rows each strip shares with the next strip
+    (the ImageSplitter overlap). Those rows are only taken from the later
+    strip.
+
+    """
+
+    def __init__(self, id_regex=r'\d+', overlap=0, n_workers=None,
+            save_kwargs=None, logger=None):
+        assert(0 <= overlap)
+        assert(n_workers is None or n_workers >= 1)
+        self.id_regex = re.compile(id_regex)
+        self.overlap = overlap
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.save_kwargs = dict(save_kwargs or {})
+        self.logger = logger
+
+    def strip_id(self, filepath):
+        # Get the numeric strip id from a filepath. Returns None if the name
+        # doesn't have one.
+        ids = self.id_regex.findall(os.path.basename(filepath))
+        return int(ids[-1]) if ids else None
+
+    def find_strips(self, strip_dir):
+        # Return the strip filepaths in a directory ordered by id. Files
+        # without an id are ignored.
+        strips = []
+        for name in os.listdir(strip_dir):
+            filepath = os.path.join(strip_dir, name)
+            strip_id = self.strip_id(name)
+            if strip_id is not None and os.path.isfile(filepath):
+                strips.append((strip_id, filepath))
+        strips.sort()
+        return [filepath for strip_id, filepath in strips]
+
+    def concat_dir(self, strip_dir, output_path):
+        # Concatenate all the strips in a directory
+        return self.concat(self.find_strips(strip_dir), output_path)
+
+    def concat(self, strip_paths, output_path):
+        # Stack the strips in order and save to output_path. Returns
+        # output_path.
+        assert(len(strip_paths) > 0)
+        self._write(f"Concatenating {len(strip_paths)} strips into "
+                f"{output_path}")
+
+        # Row ranges from the headers
+        heights = []
+        widths = set()
+        for filepath in strip_paths:
+            with Image.open(filepath) as image:
+                width, height = image.size
+            heights.append(height)
+            widths.add(width)
+        assert(len(widths) == 1)
+        keep_rows = np.array(heights)
+        keep_rows[:-1] -= self.overlap
+        assert((keep_rows > 0).all())
+        stops = np.cumsum(keep_rows)
+        starts = stops - keep_rows
+
+        # dtype and channels from the first strip
+        sample = _read_strip(strip_paths[0])
+        shape = (int(stops[-1]), widths.pop()) + sample.shape[2:]
+        dtype = sample.dtype
+        del sample
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            hpm.ensure_dir_exists(output_dir, self.logger)
+        is_npy = output_path.lower().endswith('.npy')
+        array_path = output_path if is_npy else f"{output_path}.tmp.npy"
+        try:
+            output = np.lib.format.open_memmap(array_path, mode='w+',
+                    dtype=dtype, shape=shape)
+            with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+                futures = [pool.submit(_copy_strip, filepath, output,
+                    start, stop) for filepath, start, stop in zip(
+                        strip_paths, starts.tolist(), stops.tolist())]
+                for future in futures:
+                    future.result()
+            output.flush()
+
+            if not is_npy:
+                Image.fromarray(output).save(output_path, **self.save_kwargs)
+            del output
+        finally:
+            if not is_npy and os.path.isfile(array_path):
+                os.remove(array_path)
+
+        return output_path
+
+    def _write(self, msg):
+        if self.logger is None:
+            print(msg)
+        else:
+            self.logger.write(msg)
+
+
+def _read_strip(filepath):
+    # Decode a strip into an array
+    with Image.open(filepath) as image:
+        if image.mode == 'P':
+            image = image.convert('RGB')
+        return np.asarray(image)
+
+def _copy_strip(filepath, output, start, stop):
+    # Decode one strip and copy it into its rows of the output. Rows past
+    # 'stop' overlap with the next strip and are dropped.
+    strip = _read_strip(filepath)
+    assert(strip.shape[1:] == output.shape[1:])
+    output[start:stop] = strip[:stop - start]
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+""" Command line tool for splitting or reassembling batches of images.
+
+Finds the images (or strips) under a root directory with Crawler and runs
+one job per image (or strip directory) in a process pool. Jobs whose output
+already exists are skipped, so an interrupted run can just be restarted.
+A CSV report with the time taken by each job is written at the end.
+
+Examples:
+    helpyr-images split data/ --names "*.JPG" --output-dir strips/
+    helpyr-images concat strips/ --names "strip_*.jpg" --output-dir joined/
+"""
+
+import argparse
+import csv
+import os
+from os.path import join as pjoin
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from time import perf_counter
+
+from helpyr.crawler import Crawler
+from helpyr.image_concat import ImageConcatenator
+from helpyr.image_splitter import ImageSplitter
+from helpyr.logger import Logger
+from helpyr.logger import quiet_logger
+from helpyr import helpyr_misc as hpm
+
+
+# Written in a split output directory once all its strips are saved
+done_marker = '.split_done'
+
+report_fields = ['source', 'output', 'status', 'seconds', 'n_files', 'error']
+
+
+def _output_stem(root, path):
+    # Output name for a source file or directory, keeping the directory
+    # structure under root so names can't collide
+    relpath = os.path.relpath(path, root)
+    if relpath == os.curdir:
+        relpath = os.path.basename(os.path.abspath(root))
+    return os.path.splitext(relpath)[0]
+
+def _split_job(image_path, output_dir, options):
+    # Split one image into output_dir. Returns the number of strips.
+    splitter = ImageSplitter(strip_width=options['strip_width'],
+            overlap=options['overlap'],
+            output_template=options['template'], n_workers=0,
+            max_pixels=options['max_pixels'], logger=quiet_logger())
+    strips = splitter.split(image_path, output_dir)
+    with open(pjoin(output_dir, done_marker), 'w') as marker:
+        marker.write(f"{len(strips)}\n")
+    return len(strips)
+
+def _concat_job(strip_paths, output_path, options):
+    # Concatenate strips into output_path. Writes to a temporary name first
+    # so a partial output is never mistaken for a finished one.
+    concatenator = ImageConcatenator(overlap=options['overlap'],
+            n_workers=1, logger=quiet_logger())
+    stem, extension = os.path.splitext(output_path)
+    partial_path = f"{stem}.partial{extension}"
+    concatenator.concat(strip_paths, partial_path)
+    os.replace(partial_path, output_path)
+    return len(strip_paths)
+
+def _timed(job_fu, *args):
+    # Run a job in a worker and time it
+    start = perf_counter()
+    n_files = job_fu(*args)
+    return n_files, perf_counter() - start
+
+
+def find_split_jobs(args, crawler):
+    # Returns a list of (source, output, is_done, job args) tuples
+    image_paths = crawler.get_target_files(target_names=args.names,
+            target_dirs=args.dirs, verbose_file_list=False)
+    options = {'strip_width': args.strip_width, 'overlap': args.overlap,
+            'template': args.template, 'max_pixels': args.max_pixels}
+    jobs = []
+    for image_path in sorted(image_paths):
+        output_dir = pjoin(args.output_dir, _output_stem(args.root, image_path))
+        is_done = os.path.isfile(pjoin(output_dir, done_marker))
+        jobs.append((image_path, output_dir, is_done,
+            (_split_job, image_path, output_dir, options)))
+    return jobs
+
+def find_concat_jobs(args, crawler):
+    # Groups the strips by directory. Returns a list of (source, output,
+    # is_done, job args) tuples.
+    strip_paths = crawler.get_target_files(target_names=args.names,
+            target_dirs=args.dirs, verbose_file_list=False)
+    concatenator = ImageConcatenator(id_regex=args.id_regex)
+    strip_dirs = {}
+    for strip_path in strip_paths:
+        if concatenator.strip_id(strip_path) is not None:
+            strip_dir = os.path.dirname(strip_path)
+            strip_dirs.setdefault(strip_dir, []).append(strip_path)
+
+    options = {'overlap': args.overlap}
+    jobs = []
+    for strip_dir in sorted(strip_dirs):
+        strips = sorted(strip_dirs[strip_dir], key=concatenator.strip_id)
+        output_path = pjoin(args.output_dir,
+                _output_stem(args.root, strip_dir) + args.extension)
+        is_done = os.path.isfile(output_path)
+        jobs.append((strip_dir, output_path, is_done,
+            (_concat_job, strips, output_path, options)))
+    return jobs
+
+def run_jobs(jobs, n_workers, write=print):
+    # Run the jobs in a process pool, printing progress as they finish.
+    # Returns the report rows.
+    rows = []
+    todo = []
+    for source, output, is_done, job_args in jobs:
+        if is_done:
+            rows.append({'source': source, 'output': output,
+                'status': 'skipped', 'seconds': '', 'n_files': '',
+                'error': ''})
+        else:
+            todo.append((source, output, job_args))
+    n_skipped = len(rows)
+    if n_skipped:
+        write(f"Skipping {n_skipped} jobs with existing outputs")
+
+    n_jobs = len(todo)
+    if n_jobs == 0:
+        return rows
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = {}
+        for source, output, job_args in todo:
+            # Make the output directory here so workers don't race
+            output_dir = output if job_args[0] is _split_job else \
+                    os.path.dirname(output)
+            hpm.ensure_dir_exists(output_dir, quiet_logger())
+            futures[pool.submit(_timed, *job_args)] = (source, output)
+
+        for n_finished, future in enumerate(as_completed(futures), 1):
+            source, output = futures[future]
+            row = {'source': source, 'output': output}
+            try:
+                n_files, seconds = future.result()
+                row.update(status='done', seconds=f"{seconds:.3f}",
+                        n_files=n_files, error='')
+                msg = f"{n_files} files in {seconds:.2f} s"
+            except Exception as error:
+                row.update(status='failed', seconds='', n_files='',
+                        error=repr(error))
+                msg = f"FAILED: {error!r}"
+            rows.append(row)
+            write(f"[{n_finished}/{n_jobs}] {source}: {msg}")
+    return rows
+
+def write_report(rows, report_path):
+    # Write the job report as a CSV file
+    report_dir = os.path.dirname(report_path)
+    if report_dir:
+        hpm.ensure_dir_exists(report_dir, quiet_logger())
+    with open(report_path, 'w', newline='') as report_file:
+        writer = csv.DictWriter(report_file, fieldnames=report_fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='helpyr-images',
+            description="Split images into strips or reassemble strips.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('root',
+            help="directory to search for input files")
+    common.add_argument('--output-dir', required=True,
+            help="directory for the outputs")
+    common.add_argument('--names', nargs='+', default=None,
+            help="filename patterns to process (* and ? wildcards, "
+                 "default depends on the command)")
+    common.add_argument('--dirs', nargs='+', default=[],
+            help="only search directories with these names")
+    common.add_argument('--overlap', type=int, default=0,
+            help="rows shared by neighbouring strips")
+    common.add_argument('--workers', type=int, default=None,
+            help="number of worker processes (default: all cpus)")
+    common.add_argument('--report', default=None,
+            help="CSV timing report path "
+                 "(default: OUTPUT_DIR/<command>_report.csv)")
+    common.add_argument('--log', default=None,
+            help="also write progress to this log file")
+
+    split = subparsers.add_parser('split', parents=[common],
+            help="split images into strips, one directory per image")
+    split.set_defaults(default_names=['*.jpg', '*.JPG', '*.jpeg', '*.png', '*.tif',
+        '*.tiff'], find_jobs=find_split_jobs)
+    split.add_argument('--strip-width', type=int, default=45,
+            help="approximate number of rows per strip")
+    split.add_argument('--template', default='strip_{}.jpg',
+            help="strip filename template, formatted with the strip id")
+    split.add_argument('--max-pixels', type=int, default=None,
+            help="largest image size to open, for trusted images over "
+                 "Pillow's decompression bomb limit")
+
+    concat = subparsers.add_parser('concat', parents=[common],
+            help="reassemble each directory of strips into one image")
+    concat.set_defaults(default_names=['strip_*'], find_jobs=find_concat_jobs)
+    concat.add_argument('--extension', default='.jpg',
+            help="output image extension, e.g. .png or .npy")
+    concat.add_argument('--id-regex', default=r'\d+',
+            help="regex for the strip ids (the last match is used)")
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.names is None:
+        args.names = args.default_names
+    logger = None if args.log is None else Logger(args.log)
+    write = print if logger is None else logger.write
+
+    crawler = Crawler(logger=logger)
+    crawler.set_root(args.root, verbose=False)
+    jobs = args.find_jobs(args, crawler)
+    write(f"Found {len(jobs)} {args.command} jobs under {args.root}")
+
+    rows = run_jobs(jobs, args.workers, write)
+
+    report_path = args.report
+    if report_path is None:
+        report_path = pjoin(args.output_dir, f"{args.command}_report.csv")
+    write_report(rows, report_path)
+    write(f"Report written to {report_path}")
+
+    n_failed = sum(row['status'] == 'failed' for row in rows)
+    if n_failed:
+        write(f"{n_failed} jobs failed")
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,71 +1,229 @@
+#!/usr/bin/env python3
+
+import os
+from os.path import join as pjoin
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+
 import numpy as np
-import scipy as sc
-from scipy import ndimage
-from scipy import misc
-
-path = '../data/testing/'
-lower_file = 'lower.JPG'
-upper_file = 'upper.JPG'
-split_file_template = '/strips/strip_{}.JPG'
-
-print("Opening files...", end='')
-lower = sc.ndimage.imread(path + lower_file)
-upper = sc.ndimage.imread(path + upper_file)
-
-sources = lower, upper
-print("Done!")
-
-print("Making a rainbow stripe for testing...", end='')
-# Make a rainbow stripe for testing in just the upper image
-# rgb cycle
-# 100
-# 110
-# 010
-# 011
-# 001
-# 101
-n_rows = upper.shape[0]
-n_div = 6
-nd_rows = n_rows//n_div
-slant = np.linspace(0, 255, num=nd_rows, endpoint=True)
-high = 255*np.ones(nd_rows)
-low = np.zeros(nd_rows) # accounts for odd length rows
-low_odd = np.zeros(n_rows - (n_div-1)*nd_rows) # accounts for odd length rows
-#           _         _
-# channel =   \ _ _ /   
-#             _ _
-# channel = /     \ _ _
-  #               _ _
-# channel = _ _ /     \
-channel = np.concatenate([high, slant[::-1], low, low_odd, slant[::1], high])
-
-
-rgb = np.zeros((n_rows, 3))
-rgb[:,0] = np.roll(channel, 0*nd_rows)
-rgb[:,1] = np.roll(channel, 2*nd_rows)
-rgb[:,2] = np.roll(channel, 4*nd_rows)
-
-upper[:, 0:50, :] = rgb[:,np.newaxis,:]
-
-print("Done!")
-
-print("Splitting images...", end='')
-strip_width = 45
-strips = []
-for source in sources:
-    n_rows = source.shape[0]
-    n_strips = n_rows // strip_width
-
-    strips += np.array_split(source, n_strips, axis=0)
-
-
-print("Done!")
-print("{} strips created.".format(len(strips)))
-
-print("Saving...", end='')
-for id, strip in enumerate(strips):
-    image = sc.misc.toimage(strip, channel_axis=2)
-    sc.misc.imsave(path + split_file_template.format(id), image)
-print("Done!")
+from PIL import Image
+
+from helpyr import helpyr_misc as hpm
+
+
+class ImageSplitter:
+    """
+
+    Splits images into horizontal strips (groups of rows) and saves each strip
+    as its own image. Strip ids count up across all the images split in one
+    call, so splitting a lower and an upper image gives one numbered series.
+
+    Images are decoded once by Pillow (which needs the whole image in memory
+    once) and copied in blocks of rows into a memory mapped .npy cache (.npy
+    sources are memory mapped directly). The strips are then cropped from
+    the cache and encoded by 'n_workers' processes, so each worker only
+    holds one strip in memory. n_workers=0 writes the strips in this
+    process.
+
+    Pillow refuses images over Image.MAX_IMAGE_PIXELS (about 179 MP) as
+    possible decompression bombs. Set 'max_pixels' to split larger trusted
+    images; the limit is only changed while the splitter opens them. None
+    keeps Pillow's limit.
+
+    The rows are split like np.array_split into n_rows // strip_width strips
+    of about 'strip_width' rows. Each strip also includes the first 'overlap'
+    rows of the next strip. 'output_template' is formatted with the strip id
+    to make the file name; its extension sets the image format.
+
+    """
+
+    # Rows decoded per block when filling the cache
+    block_rows = 1024
+
+    def __init__(self, strip_width=45, overlap=0,
+            output_template='strip_{}.jpg', n_workers=None, save_kwargs=None,
+            cache_dir=None, max_pixels=None, logger=None):
+        assert(strip_width >= 1)
+        assert(0 <= overlap)
+        assert(n_workers is None or n_workers >= 0)
+        self.strip_width = strip_width
+        self.overlap = overlap
+        self.output_template = output_template
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.save_kwargs = dict(save_kwargs or {})
+        self.cache_dir = cache_dir
+        self.max_pixels = max_pixels
+        self.logger = logger
+
+    def strip_bounds(self, n_rows):
+        # Return a list of (start, stop) row ranges for the strips
+        n_strips = max(1, n_rows // self.strip_width)
+        base, extra = divmod(n_rows, n_strips)
+        sizes = np.full(n_strips, base)
+        sizes[:extra] += 1
+        stops = np.cumsum(sizes)
+        starts = stops - sizes
+        assert(self.overlap <= base)
+        stops = np.minimum(stops + self.overlap, n_rows)
+        return list(zip(starts.tolist(), stops.tolist()))
+
+    def split(self, image_path, output_dir, start_id=0):
+        # Split one image. Returns the list of strip filepaths.
+        return self.split_many([image_path], output_dir, start_id)
+
+    def split_many(self, image_paths, output_dir, start_id=0):
+        # Split several images into one numbered series of strips. Returns
+        # the list of strip filepaths.
+        hpm.ensure_dir_exists(output_dir, self.logger)
+        strip_id = start_id
+        output_paths = []
+
+        pool = None
+        if self.n_workers > 0:
+            pool = ProcessPoolExecutor(max_workers=self.n_workers)
+        try:
+            with TemporaryDirectory(dir=self.cache_dir) as tmp_dir:
+                previous = None # (cache filepath, strip futures)
+                for image_id, image_path in enumerate(image_paths):
+                    self._write(f"Decoding {image_path}")
+                    cache_path = pjoin(tmp_dir, f"{image_id}.npy")
+                    source_path = self.decode_to_cache(image_path, cache_path)
+                    n_rows = np.load(source_path, mmap_mode='r').shape[0]
+
+                    futures = []
+                    for start, stop in self.strip_bounds(n_rows):
+                        filename = self.output_template.format(strip_id)
+                        output_path = pjoin(output_dir, filename)
+                        futures.append(self._submit(pool, _write_strip,
+                            source_path, start, stop, output_path,
+                            self.save_kwargs))
+                        output_paths.append(output_path)
+                        strip_id += 1
+                    self._write(f"Splitting {image_path} into "
+                            f"{len(futures)} strips")
+
+                    # Only keep the caches of two images at a time
+                    if previous is not None:
+                        self._finish_image(*previous)
+                    previous = (cache_path, futures)
+
+                if previous is not None:
+                    self._finish_image(*previous)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self._write(f"{len(output_paths)} strips created")
+        return output_paths
+
+    def decode_to_cache(self, image_path, cache_path):
+        # Decode an image and copy it into a .npy file in blocks of rows.
+        # Returns the path of the .npy file to read the strips from
+        # (image_path if it is already a .npy file).
+        if image_path.lower().endswith('.npy'):
+            return image_path
+
+        with _pixel_limit(self.max_pixels), Image.open(image_path) as image:
+            n_cols, n_rows = image.size
+            if self.max_pixels is not None:
+                assert(n_cols * n_rows <= self.max_pixels), \
+                        f"{image_path} is larger than {self.max_pixels} pixels"
+            if image.mode == 'P':
+                image = image.convert('RGB')
+            # Most formats can only be decoded whole. The blocks just keep a 
+            # second full copy from being made.
+            image.load()
+            first_block = np.asarray(image.crop(
+                (0, 0, n_cols, min(n_rows, self.block_rows))))
+            cache = np.lib.format.open_memmap(cache_path, mode='w+',
+                    dtype=first_block.dtype,
+                    shape=(n_rows,) + first_block.shape[1:])
+            cache[:len(first_block)] = first_block
+            del first_block
+            for start in range(self.block_rows, n_rows, self.block_rows):
+                stop = min(n_rows, start + self.block_rows)
+                cache[start:stop] = np.asarray(
+                        image.crop((0, start, n_cols, stop)))
+            cache.flush()
+            del cache
+        return cache_path
+
+    def _finish_image(self, cache_path, futures):
+        # Wait for the strips of one image and delete its cache
+        for future in futures:
+            future.result()
+        if os.path.isfile(cache_path):
+            os.remove(cache_path)
+
+    def _submit(self, pool, fu, *args):
+        # Submit to the pool, or run now if there isn't one
+        if pool is not None:
+            return pool.submit(fu, *args)
+        future = Future()
+        future.set_result(fu(*args))
+        return future
+
+    def _write(self, msg):
+        if self.logger is None:
+            print(msg)
+        else:
+            self.logger.write(msg)
+
+
+@contextmanager
+def _pixel_limit(max_pixels):
+    # Replace Pillow's decompression bomb limit while opening an image. The 
+    # caller checks the size against max_pixels itself.
+    if max_pixels is None:
+        yield
+        return
+    previous = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = previous
+
+def _write_strip(source_path, start, stop, output_path, save_kwargs):
+    # Crop one strip from a .npy file and save it as an image. Runs in the
+    # worker processes.
+    source = np.load(source_path, mmap_mode='r')
+    strip = np.ascontiguousarray(source[start:stop])
+    del source
+    Image.fromarray(strip).save(output_path, **save_kwargs)
+    return output_path
+
+def add_rainbow_stripe(image, width=50):
+    # Paint a vertical rainbow stripe on the left edge of an RGB image array
+    # (in place). Useful for checking the strip order after reassembling.
+    # rgb cycle
+    # 100
+    # 110
+    # 010
+    # 011
+    # 001
+    # 101
+    n_rows = image.shape[0]
+    n_div = 6
+    nd_rows = n_rows//n_div
+    slant = np.linspace(0, 255, num=nd_rows, endpoint=True)
+    high = 255*np.ones(nd_rows)
+    low = np.zeros(nd_rows)
+    low_odd = np.zeros(n_rows - (n_div-1)*nd_rows) # accounts for odd lengths
+    #           _         _
+    # channel =   \ _ _ /
+    #             _ _
+    # channel = /     \ _ _
+      #               _ _
+    # channel = _ _ /     \
+    channel = np.concatenate([high, slant[::-1], low, low_odd, slant[::1], high])
 
+    rgb = np.zeros((n_rows, 3))
+    rgb[:,0] = np.roll(channel, 0*nd_rows)
+    rgb[:,1] = np.roll(channel, 2*nd_rows)
+    rgb[:,2] = np.roll(channel, 4*nd_rows)
 
+    image[:, 0:width, :] = rgb[:,np.newaxis,:]
+    return image
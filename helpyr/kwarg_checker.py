@@ -1,5 +1,34 @@
 #!/usr/bin/env python3
 
+from collections import namedtuple
+from functools import wraps
+from itertools import repeat
+import inspect
+import sys
+
+# Global switch for the check_kwargs decorator. Validation is skipped (only 
+# defaults are filled in) when False. Off by default when running python -O, 
+# which also strips the assertions used by the other checks.
+_validation_enabled = __debug__
+
+# Lists or tuples at least this long are checked and cast with vectorized 
+# numpy operations when possible. Shorter ones aren't worth the overhead.
+_VECTORIZE_MIN_LENGTH = 64
+
+# numpy dtype kinds matching each basic type for 'array' checks
+_DTYPE_KINDS = {int: 'iu', float: 'f', bool: 'b', str: 'U'}
+
+# Inferred dtype kinds that astype(type).tolist() converts exactly like 
+# casting each element. E.g. ints >= 2**63 are inferred as uint64 or float64 
+# and would wrap or round when cast to int.
+_LOSSLESS_CAST_KINDS = {int: 'bi', float: 'bif', bool: 'b', str: 'U'}
+
+def _numpy():
+    # numpy is only needed for long sequences and arrays, so it is imported 
+    # on first use to keep importing kwarg_checker fast
+    import numpy
+    return numpy
+
 def check_kwarg(kwargs, name, default=None, arg_type=None, required=False, pop=False):
     """ Simple function for checking a kwarg. Useful if you don't want to
     create a new object to check a kwarg or two. Pop=True will remove the 
@@ -14,16 +43,11 @@ def check_kwarg(kwargs, name, default=None, arg_type=None, required=False, pop=F
     if name in kwargs:
         out = kwargs.pop(name) if pop else kwargs[name]
 
-    type_handle = _assert_types(out, name=name, arg_type=arg_type)
-    if type_handle is None:
-        # No type casting
+    if not arg_type:
         return out
-    elif isinstance(type_handle, (list, tuple)):
-        # Type casting elements in a list
-        return [th(element) for th, element in zip(type_handle, out)]
-    else:
-        # Type casting a single output variable
-        return type_handle(out)
+    spec = _compiled_specs.get(arg_type) or _compile_arg_type(arg_type)
+    type_handle = spec.check(out, name)
+    return out if type_handle is None else _cast(out, type_handle)
 
 def get_check_kwarg_fu(function_kwargs, pop=False):
     """ Create a simple function for checking kwargs. Useful if you don't 
@@ -50,16 +74,11 @@ def check_add_kwarg(kwargs, name, default=None, arg_type=None, force=False):
         kwargs[name] = default
     
     out = kwargs[name]
-    type_handle = _assert_types(out, name=name, arg_type=arg_type)
-    if type_handle is None:
-        # No type casting
+    if not arg_type:
         return out
-    elif isinstance(type_handle, (list, tuple)):
-        # Type casting elements in a list
-        return [th(element) for th, element in zip(type_handle, out)]
-    else:
-        # Type casting a single output variable
-        return type_handle(out)
+    spec = _compiled_specs.get(arg_type) or _compile_arg_type(arg_type)
+    type_handle = spec.check(out, name)
+    return out if type_handle is None else _cast(out, type_handle)
 
 def get_check_add_kwarg_fu(function_kwargs):
     """ Create a simple function for checking and adding kwargs. """
@@ -70,6 +89,145 @@ def get_check_add_kwarg_fu(function_kwargs):
 
 
 
+def set_kwarg_validation(enabled):
+    """ Globally turn check_kwargs validation on or off. Turning it off is 
+    meant for optimized production runs; defaults are still filled in but 
+    no type checking or casting happens. """
+    global _validation_enabled
+    _validation_enabled = bool(enabled)
+
+
+KwargSpec = namedtuple('KwargSpec',
+        ['name', 'default', 'arg_type', 'required', 'pop'],
+        defaults=[None, None, False, False])
+KwargSpec.__doc__ = """ Specification for one kwarg checked by check_kwargs. 
+The fields mean the same thing as the check_kwarg arguments. """
+
+def check_kwargs(*specs):
+    """ Decorator for declaring a function's kwarg checks once.
+
+    Each spec is a KwargSpec or a tuple/dict of KwargSpec fields (name, 
+    default, arg_type, required, pop). The specs are compiled when the 
+    function is defined. On each call the kwargs are checked and filled in a 
+    single pass and the checked (and cast, if 'tcast') values are passed on 
+    to the function as kwargs, so the function can read them straight out 
+    of kwargs or name them as parameters. Parameters passed positionally 
+    are checked and passed on in place.
+
+    pop=True consumes the kwarg: it is checked, but only passed on if the 
+    function names it as a parameter. Otherwise it is removed so it doesn't 
+    leak into a **kwargs passthrough (e.g. to a plotting function).
+
+    Example:
+        @check_kwargs(
+                ('sep', '_', 'str'),
+                KwargSpec('figure', required=True, pop=True),
+                )
+        def save(figure, **kwargs):
+            ...
+
+    """
+    specs = [_as_kwarg_spec(spec) for spec in specs]
+
+    def decorator(function):
+        parameters = inspect.signature(function).parameters
+        named = {name for name, param in parameters.items()
+                if param.kind in (param.POSITIONAL_OR_KEYWORD, 
+                                  param.KEYWORD_ONLY)}
+        # Index in args for parameters that can be passed positionally. 
+        # Other specs get an index no args tuple can reach.
+        positions = {name: i for i, (name, param) in 
+                enumerate(parameters.items())
+                if param.kind == param.POSITIONAL_OR_KEYWORD}
+        for spec in specs:
+            param = parameters.get(spec.name)
+            assert param is None or param.kind != param.POSITIONAL_ONLY, \
+                    f"{spec.name} is positional only and can't be checked"
+
+        # (name, default, compiled type spec, required, pass on, position)
+        compiled = [(spec.name, spec.default,
+                     _compile_arg_type(spec.arg_type) if spec.arg_type else None,
+                     spec.required,
+                     not spec.pop or spec.name in named,
+                     positions.get(spec.name, sys.maxsize))
+                    for spec in specs]
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            n_args = len(args)
+            if not _validation_enabled:
+                for name, default, _, _, pass_on, position in compiled:
+                    if position < n_args:
+                        continue
+                    elif not pass_on:
+                        kwargs.pop(name, None)
+                    elif name not in kwargs:
+                        kwargs[name] = default
+                return function(*args, **kwargs)
+
+            for name, default, type_spec, required, pass_on, position \
+                    in compiled:
+                is_positional = position < n_args
+                if is_positional:
+                    value = args[position]
+                elif name in kwargs:
+                    value = kwargs[name]
+                else:
+                    assert not required, f"{name} not in kwargs"
+                    value = default
+
+                if type_spec is not None:
+                    type_handle = type_spec.check(value, name)
+                    if type_handle is not None:
+                        value = _cast(value, type_handle)
+                        if is_positional:
+                            args = args[:position] + (value,) \
+                                    + args[position + 1:]
+
+                if not is_positional:
+                    if pass_on:
+                        kwargs[name] = value
+                    else:
+                        kwargs.pop(name, None)
+            return function(*args, **kwargs)
+
+        wrapper.kwarg_specs = specs
+        return wrapper
+    return decorator
+
+def _as_kwarg_spec(spec):
+    if isinstance(spec, KwargSpec):
+        return spec
+    elif isinstance(spec, dict):
+        return KwargSpec(**spec)
+    else:
+        return KwargSpec(*spec)
+
+
+
+def _cast(value, type_handle):
+    """Cast value with the type handle(s) returned by _assert_types."""
+    if type_handle is None:
+        # No type casting
+        return value
+    elif isinstance(type_handle, _UniformHandles):
+        # Type casting a long list where every element already has the type. 
+        # Cast them all at once unless numpy can't hold them exactly (e.g. 
+        # huge ints)
+        th = type_handle[0]
+        array = _numpy().asarray(value)
+        if array.dtype.kind in _LOSSLESS_CAST_KINDS.get(th, ''):
+            return array.astype(th, copy=False).tolist()
+        return [th(element) for element in value]
+    elif isinstance(type_handle, (list, tuple)):
+        # Type casting elements in a list
+        return [th(element) for th, element in zip(type_handle, value)]
+    else:
+        # Type casting a single output variable
+        return type_handle(value)
+
+
+
 def _generic_assert_type(arg, arg_name, type_handle, type_name, type_casting_ok):
     """Assert if the arg is of type(s) type_handle or, if type_casting_ok is 
     True, assert if the arg can be cast to any of type_handle.
@@ -95,15 +253,20 @@ def _generic_assert_type(arg, arg_name, type_handle, type_name, type_casting_ok)
     -------
     type_handle :
         The returned type handle will be the same as the input type_handle 
-        unless type_casting_ok is True and there are multiple accepted types. 
-        If so, the return handle will be the first successful type to cast the 
-        variable.
+        unless there are multiple accepted types. If so, the return handle 
+        will be the type the variable already is or, if type_casting_ok is 
+        True, the first successful type to cast the variable.
     """
-    error_message = f"{arg_name} ({type(arg)}) must be of type {type_name}"
     output_type_handle = type_handle
     try:
-        # See if arg is of type(s) type_handle
-        assert isinstance(arg, type_handle), error_message
+        # See if arg is of type(s) type_handle. The message is only built if 
+        # the check fails.
+        assert isinstance(arg, type_handle), \
+                f"{arg_name} ({type(arg)}) must be of type {type_name}"
+        if isinstance(type_handle, (tuple, list)):
+            # Multiple accepted types, return the one arg already matches
+            output_type_handle = next(
+                    th for th in type_handle if isinstance(arg, th))
 
     except AssertionError as wrong_type_error:
         # arg is not of type type_handle
@@ -150,8 +313,9 @@ def _assert_types(arg, name='arg', arg_type=None):
 
     arg_type :
         A string representing the accepted type or types for the variable. 
-        Currently handles the basic types: 'list', 'tuple', 'int', 'float', 
-        'str', and 'bool').  Can specify extra qualifiers too. Multiple 
+        Currently handles the basic types: 'list', 'tuple', 'array' (numpy 
+        ndarray), 'int', 'float', 'str', and 'bool').  Can specify extra 
+        qualifiers too. Multiple 
         types and qualifiers can be present in the string. Order only matters 
         if checking casting between both int and float(e.g. 'int-float' vs. 
         'float-int'), where the first ones are given preference.
@@ -170,6 +334,9 @@ def _assert_types(arg, name='arg', arg_type=None):
         'float-int-pos' = Check if variable is a positive (>0) float or int.
         'int-whole-tcast' =
             Check if variable is or can be cast to a whole (>=0) int.
+        'array-float-pos' = 
+            Check if variable is a numpy array of positive floats. Arrays 
+            are checked by dtype and cast with a single astype.
 
     Returns
     -------
@@ -181,82 +348,265 @@ def _assert_types(arg, name='arg', arg_type=None):
     # No type requirements
     if arg_type is None or arg_type == '':
         return
-     
-    # Check that None is allowed if the arg is still None
-    elif arg is None:
-        assert 'none' in arg_type, f"{name} cannot be None"
-        return # arg is okay, no further checking needed
-
-    type_casting_ok = 'tcast' in arg_type
-    output_type_handle = None
-    is_sequence = False
-
-    # Check list types
-    if 'list' in arg_type or 'tuple' in arg_type:
-        is_sequence = True
-        # For either lists or tuples, assert that all elements are a valid type
-
-        assert isinstance(arg, (list, tuple))
-        if isinstance(arg, list):
-            assert 'list' in arg_type
-        elif isinstance(arg, tuple):
-            assert 'tuple' in arg_type
-
-        output_type_handle = []
-        sequence_arg_type = \
+
+    return _compile_arg_type(arg_type).check(arg, name)
+
+
+# {arg_type string : _TypeSpec}
+_compiled_specs = {}
+
+def _compile_arg_type(arg_type):
+    """Parse an arg_type string into a reusable _TypeSpec. Cached, so each 
+    distinct arg_type string is only parsed once."""
+    spec = _compiled_specs.get(arg_type)
+    if spec is None:
+        spec = _compiled_specs[arg_type] = _TypeSpec(arg_type)
+    return spec
+
+
+class _TypeSpec:
+    """Compiled version of an arg_type string (see _assert_types). All the 
+    string parsing happens once in the constructor so checking an arg is 
+    just a few attribute lookups."""
+
+    __slots__ = ('arg_type', 'allow_none', 'type_casting_ok', 'kind',
+            'handles', 'type_name', 'list_ok', 'tuple_ok', 'element_spec',
+            'multi_type', 'sign', 'vectorizable', 'dtype_kinds')
+
+    def __init__(self, arg_type):
+        self.arg_type = arg_type
+        self.allow_none = 'none' in arg_type
+        self.type_casting_ok = 'tcast' in arg_type
+        self.handles = None
+        self.type_name = None
+        self.element_spec = None
+        self.list_ok = 'list' in arg_type
+        self.tuple_ok = 'tuple' in arg_type
+
+        # Type of check
+        if 'array' in arg_type:
+            # numpy array with a dtype matching the element type
+            self.kind = 'array'
+            element_arg_type = arg_type.replace('array', '').strip('_- ')
+            if element_arg_type:
+                self.element_spec = _compile_arg_type(element_arg_type)
+        elif self.list_ok or self.tuple_ok:
+            # For either lists or tuples, all elements must be a valid type
+            self.kind = 'sequence'
+            sequence_arg_type = \
                 arg_type.replace('list','').replace('tuple', '').strip('_- ')
-        for element in arg:
-            # Check each element
-            output_type_handle.append(
-                    _assert_types(
-                        element, name=name, arg_type=sequence_arg_type)
-                    )
-
-    # Check numeric types
-    elif 'int' in arg_type and 'float' in arg_type:
-        # int or float allowed
-        # The order is set by which one comes first
-        int_idx = arg_type.index('int')
-        float_idx = arg_type.index('float')
-        handles = (int, float) if int_idx < float_idx else (float, int)
-        output_type_handle = _generic_assert_type(
-                arg, name, handles, 'float or int', type_casting_ok)
-    elif 'int' in arg_type:
-        output_type_handle = _generic_assert_type(
-                arg, name, int, 'int', type_casting_ok)
-    elif 'float' in arg_type:
-        output_type_handle = _generic_assert_type(
-                arg, name, float, 'float', type_casting_ok)
-    
-    # Check other types
-    elif 'str' in arg_type:
-        output_type_handle = _generic_assert_type(
-                arg, name, str, 'string', type_casting_ok)
-    elif 'bool' in arg_type:
-        output_type_handle = _generic_assert_type(
-                arg, name, bool, 'boolean', type_casting_ok)
-
-    # Unknown type requirement
-    else:
-        print(f"Unknown arg type!")
-        print(f"arg={arg}, name={name}, arg_type={arg_type}")
-        raise NotImplementedError
-
-    # Check numeric sign
-    if 'int' in arg_type or 'float' in arg_type:
-        # Check sign
-        if 'pos' in arg_type or 'counting' in arg_type:
-            assert arg > 0, f"{name} must be greater than zero ({arg})"
-        elif 'whole' in arg_type:
-            assert arg >= 0, f"{name} must be greater or equal to zero ({arg})"
-        elif 'neg' in arg_type:
-            assert arg < 0, f"{name} must be less than zero ({arg})"
+            if sequence_arg_type:
+                self.element_spec = _compile_arg_type(sequence_arg_type)
+        elif 'int' in arg_type and 'float' in arg_type:
+            # int or float allowed
+            # The order is set by which one comes first
+            self.kind = 'type'
+            int_idx = arg_type.index('int')
+            float_idx = arg_type.index('float')
+            self.handles = (int, float) if int_idx < float_idx else (float, int)
+            self.type_name = 'float or int'
+        elif 'int' in arg_type:
+            self.kind = 'type'
+            self.handles, self.type_name = int, 'int'
+        elif 'float' in arg_type:
+            self.kind = 'type'
+            self.handles, self.type_name = float, 'float'
+        elif 'str' in arg_type:
+            self.kind = 'type'
+            self.handles, self.type_name = str, 'string'
+        elif 'bool' in arg_type:
+            self.kind = 'type'
+            self.handles, self.type_name = bool, 'boolean'
         else:
-            pass # No sign requirements
+            # Unknown type requirement. Raise an error when checking.
+            self.kind = None
+
+        self.multi_type = isinstance(self.handles, tuple)
+
+        # Numeric sign
+        self.sign = None
+        if self.kind == 'type' and ('int' in arg_type or 'float' in arg_type):
+            if 'pos' in arg_type or 'counting' in arg_type:
+                self.sign = 'pos'
+            elif 'whole' in arg_type:
+                self.sign = 'whole'
+            elif 'neg' in arg_type:
+                self.sign = 'neg'
+
+        # Elements of long sequences can be checked all at once if there is 
+        # a single accepted type
+        element_spec = self.element_spec
+        self.vectorizable = element_spec is not None \
+                and element_spec.kind == 'type' \
+                and not isinstance(element_spec.handles, tuple)
+
+        # Accepted array dtypes
+        self.dtype_kinds = None
+        if self.kind == 'array' and element_spec is not None:
+            handles = element_spec.handles
+            if element_spec.kind != 'type':
+                self.kind = None # Unknown element type
+            elif isinstance(handles, tuple):
+                self.dtype_kinds = ''.join(_DTYPE_KINDS[th] for th in handles)
+            else:
+                self.dtype_kinds = _DTYPE_KINDS[handles]
+
+    def check(self, arg, name='arg'):
+        """Assert that arg matches the spec. Returns the same thing as 
+        _assert_types."""
+
+        # Check that None is allowed if the arg is still None
+        if arg is None:
+            assert self.allow_none, f"{name} cannot be None"
+            return # arg is okay, no further checking needed
+
+        kind = self.kind
+        if kind == 'type':
+            # Scalars. Most args already have the right type, so check that 
+            # directly before falling back to the casting checks.
+            handles = self.handles
+            if not isinstance(arg, handles):
+                output_type_handle = _generic_assert_type(
+                        arg, name, handles, self.type_name, 
+                        self.type_casting_ok)
+            elif self.multi_type:
+                # int and float. Return the one arg already matches.
+                output_type_handle = handles[0] \
+                        if isinstance(arg, handles[0]) else handles[1]
+            else:
+                output_type_handle = handles
+
+            # Check numeric sign
+            sign = self.sign
+            if sign is None:
+                pass # No sign requirements
+            elif sign == 'pos':
+                assert arg > 0, f"{name} must be greater than zero ({arg})"
+            elif sign == 'whole':
+                assert arg >= 0, \
+                        f"{name} must be greater or equal to zero ({arg})"
+            else:
+                assert arg < 0, f"{name} must be less than zero ({arg})"
+            return output_type_handle if self.type_casting_ok else None
 
-    # Assertions all passed. Return the output type handle.
-    # This will be useful only if type casting is allowed.
-    return output_type_handle if type_casting_ok else None
+        elif kind == 'sequence':
+            assert isinstance(arg, (list, tuple))
+            if isinstance(arg, list):
+                assert self.list_ok
+            else:
+                assert self.tuple_ok
+
+            element_spec = self.element_spec
+            if element_spec is None:
+                # No element requirements
+                output_type_handle = [None] * len(arg)
+            elif self.vectorizable and len(arg) >= _VECTORIZE_MIN_LENGTH \
+                    and self._check_elements_vectorized(arg, name):
+                th = element_spec.handles if self.type_casting_ok else None
+                output_type_handle = _UniformHandles(repeat(th, len(arg)))
+            else:
+                check_element = element_spec.check
+                output_type_handle = [check_element(element, name)
+                        for element in arg]
+        elif kind == 'array':
+            output_type_handle = self._check_array(arg, name)
+        else:
+            print(f"Unknown arg type!")
+            print(f"arg={arg}, name={name}, arg_type={self.arg_type}")
+            raise NotImplementedError
+
+        # Assertions all passed. Return the output type handle.
+        # This will be useful only if type casting is allowed.
+        return output_type_handle if self.type_casting_ok else None
+
+
+    def _check_elements_vectorized(self, arg, name):
+        """Check the elements of a long sequence all at once. Returns False if 
+        some elements need the slower per-element check (e.g. they need type 
+        casting). Raises the same errors as the per-element check."""
+        element_spec = self.element_spec
+        handle = element_spec.handles
+        if not all(issubclass(t, handle) for t in set(map(type, arg))):
+            return False
+
+        sign = element_spec.sign
+        if sign is not None:
+            values = _numpy().asarray(arg)
+            ok = _sign_ok(values, sign)
+            if not ok.all():
+                # Raise the same error as the per-element check would
+                bad = arg[int(ok.argmin())]
+                element_spec.check(bad, name)
+        return True
+
+    def _check_array(self, arg, name):
+        """Check a numpy array's dtype and sign. Returns an _ArrayCaster if 
+        type casting is allowed."""
+        # An array can only exist if numpy was already imported
+        np = sys.modules.get('numpy')
+        assert np is not None and isinstance(arg, np.ndarray), \
+                f"{name} ({type(arg)}) must be a numpy array"
+        element_spec = self.element_spec
+        if element_spec is None:
+            # No dtype requirements
+            return None
+
+        values = arg
+        caster = None
+        handle = element_spec.handles
+        if isinstance(handle, tuple):
+            # Use the first accepted type matching the dtype
+            matching = [th for th in handle
+                    if arg.dtype.kind in _DTYPE_KINDS[th]]
+            handle = matching[0] if matching else handle[0]
+
+        if arg.dtype.kind not in self.dtype_kinds:
+            error_message = \
+                f"{name} ({arg.dtype}) must have dtype {element_spec.type_name}"
+            assert element_spec.type_casting_ok, error_message
+            try:
+                values = arg.astype(handle)
+            except (ValueError, TypeError):
+                raise AssertionError(error_message)
+            caster = _ArrayCaster(handle, values)
+        elif element_spec.type_casting_ok:
+            caster = _ArrayCaster(handle)
+
+        sign = element_spec.sign
+        if sign is not None and not _sign_ok(values, sign).all():
+            raise AssertionError(f"{name} has elements with the wrong sign")
+
+        return caster
+
+
+class _UniformHandles(list):
+    """List of per-element type handles where every element is known to 
+    already have the same type. Lets _cast do a single vectorized cast."""
+    pass
+
+
+class _ArrayCaster:
+    """Type handle for casting a whole numpy array with a single astype. 
+    Holds on to the cast array if the check already had to make it."""
+
+    def __init__(self, handle, cast_array=None):
+        self.handle = handle
+        self.cast_array = cast_array
+
+    def __call__(self, array):
+        if self.cast_array is not None:
+            return self.cast_array
+        return array.astype(self.handle, copy=False)
+
+
+def _sign_ok(values, sign):
+    """Vectorized sign check. Returns a boolean array."""
+    if sign == 'pos':
+        return values > 0
+    elif sign == 'whole':
+        return values >= 0
+    else:
+        return values < 0
 
 
 class KwargChecker:
@@ -282,5 +632,3 @@ class KwargChecker:
         return check_kwarg(self.kwargs, name,
                 default=default, arg_type=arg_type, 
                 required=required, pop=pop)
-
-
@@ -1,34 +1,74 @@
 #!/usr/bin/env python3
 
 from time import asctime
+from time import time_ns
 import os.path
-from pandas import option_context as pd_option_context
+import glob
+import gzip
+import shutil
+import random
+from threading import Thread
 
 from helpyr.helpyr_misc import ensure_dir_exists
 
-# To do:
-# Create an archive file that accumulates all runs and change main file to be 
-# overwritten every run.
+# Log rotation:
+# The log file can be rotated when it grows past max_bytes and/or at the start 
+# of every run (rotate_per_run). Rotated segments are renamed to 
+# '<log_filepath>.<segment id>' and gzipped in a background thread. An index 
+# file ('<log_filepath>.index') records the run id, start time, segment and 
+# byte offset where each run begins so a run's output can be read back with read_run_log 
+# without searching the whole history.
+
+# Message levels. Messages below the logger's level are dropped before they 
+# are formatted. Plain write calls default to INFO.
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
 
 class Logger:
 
-    def __init__(self, log_filepath="./log-crawler.txt", default_verbose=True, no_log=False):
+    def __init__(self, log_filepath="./log-crawler.txt", default_verbose=True, no_log=False, level=INFO, max_bytes=None, rotate_per_run=False, compress_archives=True, max_items=None, max_df_rows=None, sample_seed=None):
         self.verbose = default_verbose
+        self.level = level
+        # Global limits for long lists and dataframes. None means no limit. 
+        # Can be overridden per call.
+        self.max_items = max_items
+        self.max_df_rows = max_df_rows
+        self._random = random.Random(sample_seed)
         self.global_indent = 0
         self.indent_str = 4*' '
         self.no_log = no_log or log_filepath is None or "" == log_filepath
         self.start_time = asctime()
+        # Unique id for the run index. start_time only has 1 second 
+        # resolution, so two runs can share it.
+        self.run_id = f"{time_ns()}-{os.getpid()}"
 
         if self.no_log:
-            print("Logger is set to not log")
+            if self.verbose:
+                print("Logger is set to not log")
 
         else:
             self.log_filepath = log_filepath
+            self.index_filepath = _index_path(log_filepath)
+            self.max_bytes = max_bytes
+            self.compress_archives = compress_archives
+            self._archive_threads = []
+            self._segment_id = _next_segment_id(log_filepath)
+            self._log_size = 0
+            if os.path.isfile(log_filepath):
+                self._log_size = os.path.getsize(log_filepath)
+                if rotate_per_run and self._log_size > 0:
+                    self.rotate()
+
+            run_offset = self._log_size
             ensure_dir_exists(os.path.split(log_filepath)[0], logger=self)
+            self._write_index_entry(run_offset)
 
         self.write_section_break()
         self.write_section_break()
-        self.write(f"Begin Logger run output at {self.start_time}")
+        self.write(f"Begin Logger run output at {self.start_time} "
+                f"(run {self.run_id})")
 
     def begin_output(self, name):
         self.write_section_break()
@@ -39,6 +79,53 @@ class Logger:
         self.write_section_break()
 
 
+    def _write_index_entry(self, offset):
+        # Record where this run begins
+        with open(self.index_filepath, 'a') as index_file:
+            index_file.write(f"{self.run_id}\t{self.start_time}\t"
+                    f"{self._segment_id}\t{offset}\n")
+
+    def rotate(self):
+        # Move the current log file into an archive segment and start a new 
+        # log file. The segment is compressed in a background thread.
+        if self.no_log or not os.path.isfile(self.log_filepath):
+            return
+
+        # Other loggers on the same file may have rotated it since this one 
+        # started, so look for the next free segment id now and reserve it 
+        # before moving the log file there.
+        while True:
+            segment_id = _next_segment_id(self.log_filepath)
+            segment_path = _segment_path(self.log_filepath, segment_id)
+            try:
+                os.close(os.open(segment_path,
+                    os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                continue
+        try:
+            os.replace(self.log_filepath, segment_path)
+        except FileNotFoundError:
+            # Another logger rotated the file first
+            os.remove(segment_path)
+            return
+        self._segment_id = segment_id + 1
+        self._log_size = 0
+
+        if self.compress_archives:
+            thread = Thread(target=_compress_segment, args=(segment_path,))
+            thread.start()
+            self._archive_threads.append(thread)
+
+    def wait_for_archives(self):
+        # Block until all background compression is finished
+        if self.no_log:
+            return
+        for thread in self._archive_threads:
+            thread.join()
+        self._archive_threads = []
+
+
     def increase_global_indent(self):
         self.global_indent += 1
 
@@ -47,21 +134,63 @@ class Logger:
             self.global_indent -= 1
 
 
+    def set_level(self, level):
+        self.level = level
+
+    def is_enabled(self, level=INFO, verbose=None):
+        # Check whether a message at this level would reach any sink (log 
+        # file or terminal). Cheap enough to guard expensive message 
+        # construction in calling code.
+        if level < self.level:
+            return False
+        return not self.no_log or (self.verbose if verbose is None else verbose)
+
+
     def write_section_break(self):
         self.write([80*'#', 80*' '])
 
-    def write(self, messages, verbose=None, local_indent=0):
+    def write(self, messages, verbose=None, local_indent=0, level=INFO, args=None, max_items=None, sample=False):
         # Write a message to the log file
+        #
+        # messages can be a callable returning the message(s). It will only 
+        # be called if the message will actually be written somewhere. 
+        # Similarly, args are %-style formatting args for a string message 
+        # and are only applied if the message will be written.
+        #
+        # Lists longer than max_items (or the logger's max_items if None) are 
+        # summarized by their head and tail, or by a random sample of 
+        # max_items entries if sample is True. max_items=False always writes 
+        # the whole list.
         if messages is None:
             # don't print anything if message is None
             return
 
+        # Exit early if nothing will accept the message
+        if level < self.level:
+            return
+        do_print = self.verbose if verbose is None else verbose
+        if self.no_log and not do_print:
+            return
+
+        if callable(messages):
+            # Deferred message
+            messages = messages()
+            if messages is None:
+                return
+
+        if args is not None and isinstance(messages, str):
+            messages = messages % args
+
         if isinstance(messages, str):
             # Turn messages into a list of strings
             messages = [messages]
 
         if isinstance(messages, list):
             msg_indent = (self.global_indent + local_indent) * self.indent_str
+            max_items = self.max_items if max_items is None else max_items
+            if max_items is not False and max_items is not None \
+                    and len(messages) > max_items:
+                messages = self._summarize_list(messages, max_items, sample)
         else:
             # If it isn't a list or a string, get the string representation of 
             # of whatever the object is.
@@ -71,15 +200,33 @@ class Logger:
             messages = [messages.__str__()]
             msg_indent = ''
 
-        for message in messages:
-            message = msg_indent + message
-            if not self.no_log:
-                with open(self.log_filepath, 'a') as lf:
-                    lf.write(message + '\n')
+        messages = [msg_indent + message for message in messages]
+        if not self.no_log:
+            with open(self.log_filepath, 'a') as lf:
+                lf.writelines([message + '\n' for message in messages])
+                self._log_size = lf.tell()
+            if self.max_bytes is not None and self._log_size >= self.max_bytes:
+                self.rotate()
 
-            if (verbose is None and self.verbose) or verbose:
+        if do_print:
+            for message in messages:
                 print(message)
 
+    def _summarize_list(self, messages, max_items, sample):
+        # Reduce a long list of messages to max_items entries plus a note 
+        # about what was left out. Only touches the kept entries.
+        n_messages = len(messages)
+        n_hidden = n_messages - max_items
+        if sample:
+            kept = sorted(self._random.sample(range(n_messages), max_items))
+            return [messages[i] for i in kept] + [
+                    f"... random sample of {max_items} out of {n_messages} items"]
+
+        n_head = (max_items + 1) // 2
+        n_tail = max_items - n_head
+        tail = messages[n_messages - n_tail:] if n_tail else []
+        return messages[:n_head] + [f"... {n_hidden} items not shown ..."] + tail
+
     def write_greeting(self, message):
         # writes greeting message plus a timestamp
         self.write([message, asctime()])
@@ -87,8 +234,14 @@ class Logger:
     def write_blankline(self, n=1, verbose=None):
         self.write(['']*n, verbose=verbose)
 
-    def write_dataframe(self, dataframe, name='', float_formatter=None):
-        df_str = ""
+    def write_dataframe(self, dataframe, name='', float_formatter=None, level=INFO, max_rows=None, summary=False):
+        # Write a dataframe to the log. Dataframes longer than max_rows (or 
+        # the logger's max_df_rows if None) are written as head and tail 
+        # only. If summary is True, write the shape, dtypes, and summary 
+        # statistics instead of the rows.
+        if not self.is_enabled(level):
+            # Don't render the dataframe if it won't be written
+            return
         #if context_args is None:
         #    context_args = ['display.max_rows', 10000,
         #                    'display.max_columns', 10000,
@@ -100,10 +253,37 @@ class Logger:
         def fformatter(val):
             return "{:13.3f}".format(val)
         formatter = fformatter if float_formatter is None else float_formatter
-        df_str = dataframe.to_string(float_format=formatter)
+        max_rows = self.max_df_rows if max_rows is None else max_rows
+
+        def render():
+            if summary:
+                n_rows, n_cols = dataframe.shape
+                return [f"Shape: {n_rows} rows x {n_cols} columns",
+                        "Dtypes:",
+                        *[f"{self.indent_str}{col}: {dtype}"
+                            for col, dtype in dataframe.dtypes.items()],
+                        "Summary statistics:",
+                        *dataframe.describe().to_string(
+                            float_format=formatter).split('\n'),
+                        ]
+
+            n_rows = len(dataframe)
+            if max_rows is None or n_rows <= max_rows:
+                return dataframe.to_string(float_format=formatter).split('\n')
+
+            n_head = (max_rows + 1) // 2
+            n_tail = max_rows - n_head
+            lines = dataframe.iloc[:n_head].to_string(
+                    float_format=formatter).split('\n')
+            lines.append(f"... {n_rows - max_rows} rows not shown ...")
+            if n_tail:
+                lines += dataframe.iloc[n_rows - n_tail:].to_string(
+                        float_format=formatter, header=False).split('\n')
+            return lines
+
         if name:
-            self.write(name)
-        self.write(df_str.split('\n'), local_indent=1)
+            self.write(name, level=level)
+        self.write(render, local_indent=1, level=level, max_items=False)
 
     def run_indented_function(self, function, kwargs=None, before_msg=None, after_msg=None):
         # Runs the provided function with automatically indented internal log 
@@ -125,5 +305,103 @@ class Logger:
         # Display warning messages. The first message will be the warning 
         # title.
         warning_msg = "Warning: "
-        self.write(warning_msg + messages[0] + ":")
-        self.write(messages[1:], local_indent=1)
+        self.write(warning_msg + messages[0] + ":", level=WARNING)
+        self.write(messages[1:], local_indent=1, level=WARNING)
+
+
+
+def quiet_logger():
+    # Logger that doesn't write to a file or print anything. For worker 
+    # processes and setup code that shouldn't fill the terminal.
+    return Logger(None, default_verbose=False)
+
+def _index_path(log_filepath):
+    return f"{log_filepath}.index"
+
+def _segment_path(log_filepath, segment_id):
+    # Path of an uncompressed archive segment
+    return f"{log_filepath}.{segment_id:04d}"
+
+def _next_segment_id(log_filepath):
+    # The active log file uses the id after the newest archive segment
+    ids = [-1]
+    prefix = f"{log_filepath}."
+    for path in glob.glob(glob.escape(prefix) + '[0-9]*'):
+        id_str = path[len(prefix):].split('.')[0]
+        if id_str.isdigit():
+            ids.append(int(id_str))
+    return max(ids) + 1
+
+def _compress_segment(segment_path):
+    # Gzip a segment. The .gz file only appears once it is complete.
+    tmp_path = f"{segment_path}.gz.tmp"
+    with open(segment_path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, f"{segment_path}.gz")
+    os.remove(segment_path)
+
+def _is_archived(log_filepath, segment_id):
+    segment_path = _segment_path(log_filepath, segment_id)
+    return os.path.isfile(f"{segment_path}.gz") or os.path.isfile(segment_path)
+
+def _open_segment(log_filepath, segment_id):
+    # Open a segment for reading in binary mode. Could be the active log file, 
+    # a compressed archive, or an archive that hasn't been compressed yet.
+    segment_path = _segment_path(log_filepath, segment_id)
+    if os.path.isfile(f"{segment_path}.gz"):
+        return gzip.open(f"{segment_path}.gz", 'rb')
+    elif os.path.isfile(segment_path):
+        return open(segment_path, 'rb')
+    else:
+        return open(log_filepath, 'rb')
+
+def load_run_index(log_filepath):
+    # Returns a list of (run_id, start_time, segment_id, offset) for every 
+    # logged run
+    entries = []
+    index_filepath = _index_path(log_filepath)
+    if not os.path.isfile(index_filepath):
+        return entries
+
+    with open(index_filepath, 'r') as index_file:
+        for line in index_file:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) == 3:
+                # Older index without run ids
+                fields.insert(0, fields[0])
+            run_id, start_time, segment_id, offset = fields
+            entries.append((run_id, start_time, int(segment_id), int(offset)))
+    return entries
+
+def read_run_log(log_filepath, run_id):
+    # Returns the log text written by the run with the given run_id (the 
+    # Logger's run_id attribute, also printed in the run's header). Only 
+    # reads the segment(s) containing that run.
+    entries = load_run_index(log_filepath)
+    matches = [i for i, entry in enumerate(entries) if entry[0] == run_id]
+    assert matches, f"No run '{run_id}' in {log_filepath}"
+
+    i = matches[-1]
+    _, _, segment_id, offset = entries[i]
+    if i + 1 < len(entries):
+        _, _, end_segment_id, end_offset = entries[i + 1]
+    else:
+        end_segment_id, end_offset = None, None
+
+    chunks = []
+    while True:
+        is_end = segment_id == end_segment_id
+        is_active = not _is_archived(log_filepath, segment_id)
+        with _open_segment(log_filepath, segment_id) as segment:
+            segment.seek(offset)
+            if is_end:
+                chunks.append(segment.read(end_offset - offset))
+            else:
+                chunks.append(segment.read())
+        if is_end or is_active:
+            break
+        # Run continues in the next segment
+        segment_id += 1
+        offset = 0
+
+    return b''.join(chunks).decode()
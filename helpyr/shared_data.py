@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from threading import Lock
+
+import numpy as np
+
+from helpyr.helpyr_misc import LazyModule
+
+pd = LazyModule('pandas')
+
+# Sharing arrays and dataframes with worker processes:
+# The owning process publishes arrays into shared memory blocks with a
+# SharedData object and sends the returned handles to the workers instead of
+# the data. Handles are small namedtuples that pickle quickly. Workers use
+# attach(handle) to get numpy (or pandas) views of the shared blocks without
+# copying. The owner keeps a reference count for each block and unlinks it
+# once everything using it has released it.
+#
+#   with SharedData() as shared:
+#       handle = shared.share_frame(data)
+#       with ProcessPoolExecutor() as pool:
+#           futures = [shared.submit(pool, worker, handle, i) for i in ...]
+#
+#   def worker(handle, i):
+#       with attach(handle) as data:
+#           ...
+
+
+class SharedArrayHandle(namedtuple('SharedArrayHandle',
+        ['name', 'shape', 'dtype'])):
+    """ Picklable reference to an array in a shared memory block. """
+
+    def block_names(self):
+        return [self.name]
+
+
+class SharedFrameHandle(namedtuple('SharedFrameHandle',
+        ['values', 'index', 'index_name', 'columns'])):
+    """ Picklable reference to a numeric dataframe in shared memory.
+    'values' is a SharedArrayHandle for the data. 'index' is either a
+    SharedArrayHandle (numeric indices) or the pickled index itself. """
+
+    def block_names(self):
+        names = self.values.block_names()
+        if isinstance(self.index, SharedArrayHandle):
+            names += self.index.block_names()
+        return names
+
+
+class SharedData:
+    """
+
+    Owner side of the shared memory blocks. Creates the blocks, counts the
+    references to them and unlinks them when the count drops to zero. Each
+    share_* call holds one reference for the caller; give it back with
+    release(handle). close() (or leaving the with block) unlinks any blocks
+    that are left.
+
+    Use submit(pool, fu, *args) to run a function in a worker pool with
+    handles in the args. The handles are held until the function finishes.
+
+    """
+
+    def __init__(self):
+        self._blocks = {} # {name : [SharedMemory, reference count]}
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def empty_array(self, shape, dtype=float):
+        # Allocate an uninitialized array in a new shared memory block.
+        # Returns the handle.
+        dtype = np.dtype(dtype)
+        shape = tuple(int(n) for n in np.atleast_1d(shape))
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        # SharedMemory can't be zero sized
+        shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        with self._lock:
+            self._blocks[shm.name] = [shm, 1]
+        return SharedArrayHandle(shm.name, shape, dtype.str)
+
+    def share_array(self, array):
+        # Copy an array into a new shared memory block. Returns the handle.
+        array = np.asarray(array)
+        handle = self.empty_array(array.shape, array.dtype)
+        shm = self._blocks[handle.name][0]
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        del view
+        return handle
+
+    def share_frame(self, dataframe):
+        # Copy a numeric dataframe into shared memory. Numeric indices are
+        # shared too; other indices are sent along with the handle. Returns
+        # the handle.
+        values = dataframe.to_numpy()
+        assert(values.dtype.kind in 'biuf'), \
+                f"Only numeric dataframes can be shared ({values.dtype})"
+        values_handle = self.share_array(values)
+
+        index = dataframe.index
+        if index.nlevels == 1 and index.dtype.kind in 'biuf':
+            index = self.share_array(index.to_numpy())
+        return SharedFrameHandle(values_handle, index, dataframe.index.name,
+                dataframe.columns)
+
+    def acquire(self, handle):
+        # Add a reference to the blocks of a handle
+        with self._lock:
+            for name in handle.block_names():
+                assert name in self._blocks, f"Block {name} was released"
+                self._blocks[name][1] += 1
+
+    def release(self, handle):
+        # Remove a reference to the blocks of a handle. Blocks without
+        # references are unlinked.
+        with self._lock:
+            for name in handle.block_names():
+                block = self._blocks.get(name)
+                if block is None:
+                    continue
+                block[1] -= 1
+                if block[1] <= 0:
+                    del self._blocks[name]
+                    _unlink(block[0])
+
+    def submit(self, pool, fu, *args, **kwargs):
+        # Submit fu to an executor, holding the handles in the args until it
+        # finishes. Returns the future.
+        handles = [arg for arg in list(args) + list(kwargs.values())
+                if isinstance(arg, (SharedArrayHandle, SharedFrameHandle))]
+        for handle in handles:
+            self.acquire(handle)
+        try:
+            future = pool.submit(fu, *args, **kwargs)
+        except:
+            for handle in handles:
+                self.release(handle)
+            raise
+        def release_handles(future):
+            for handle in handles:
+                self.release(handle)
+        future.add_done_callback(release_handles)
+        return future
+
+    def n_blocks(self):
+        # Number of blocks still linked
+        return len(self._blocks)
+
+    def close(self):
+        # Unlink all remaining blocks
+        with self._lock:
+            blocks = list(self._blocks.values())
+            self._blocks = {}
+        for shm, count in blocks:
+            _unlink(shm)
+
+
+def _unlink(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+class _AttachedBlock:
+    # Keeps a shared memory block mapped while arrays use it. Arrays made
+    # with np.asarray(block) reference it as their base, so the block is
+    # closed once the last array (or view of one) is garbage collected.
+
+    def __init__(self, array_handle):
+        self._shm = shared_memory.SharedMemory(name=array_handle.name)
+        self.__array_interface__ = np.ndarray(array_handle.shape,
+                dtype=np.dtype(array_handle.dtype),
+                buffer=self._shm.buf).__array_interface__
+
+    def __del__(self):
+        self._shm.close()
+
+def _view(handle):
+    # Build the numpy or pandas view of a handle
+    if isinstance(handle, SharedArrayHandle):
+        return np.asarray(_AttachedBlock(handle))
+    index = handle.index
+    if isinstance(index, SharedArrayHandle):
+        index = pd.Index(np.asarray(_AttachedBlock(index)),
+                name=handle.index_name, copy=False)
+    return pd.DataFrame(np.asarray(_AttachedBlock(handle.values)),
+            index=index, columns=handle.columns, copy=False)
+
+@contextmanager
+def attach(handle):
+    """ Attach to the shared memory of a handle. Yields a numpy array for a
+    SharedArrayHandle or a dataframe for a SharedFrameHandle. Both are views
+    of the shared memory, so writes are seen by every process. The blocks
+    stay mapped until the views (and any views made from them) are gone. """
+    yield _view(handle)
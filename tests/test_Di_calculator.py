@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_array_equal
+
+from helpyr.Di_calculator import calc_Di
+from helpyr.Di_calculator import calc_Dis
+from helpyr.Di_calculator import calc_Di_chunked
+from helpyr.Di_calculator import calc_Di_array
+from helpyr.Di_calculator import calc_Di_parallel
+from helpyr.Di_calculator import DiWorkspace
+from helpyr.Di_calculator import GrainSizeDistribution
+from helpyr.Di_calculator import IncrementalDiCalculator
+
+
+def _reference_calc_Di(data, target_Di=50):
+    """The original pandas implementation of calc_Di."""
+    # Calculate the Di values for a dataframe of sieve masses
+    # data should be a dataframe of raw masses per size class (size sorted 
+    # smallest to largest)
+    # target_Di is an integer between 0 and 100 (string like 'D50' okay too)
+    # 
+    # returns series
+
+    if isinstance(target_Di, str):
+        target_Di = int(target_Di[1:])
+
+    assert(0 < target_Di < 100)
+    target = target_Di/100
+    name = f"D{target_Di}"
+
+    notnull_idx = data.notnull().all(axis=1)
+    raw_data = data
+    data = data.loc[notnull_idx, :]
+    # Calculate cumulative curve and normalize
+    cumsum = data.cumsum(axis=1)
+    notnull_fractional = cumsum.divide(cumsum.iloc[:, -1], axis=0)
+
+    # Make sure the target falls between datapoints on the distribution
+    fines_okay = (notnull_fractional < target).any(axis=1)
+    coarse_okay = (notnull_fractional > target).any(axis=1)
+    okay_rows = fines_okay & coarse_okay
+    fractional = notnull_fractional.loc[okay_rows, :]
+
+    # interpolate the percentile
+    # I CANNOT find a cleaner way to do this... Definitely not in Pandas.
+    np_frac = fractional.values
+    np_cols = fractional.columns.values
+
+    np_equal = np_frac == target
+
+    np_lesser = np_frac < target
+    np_rlesser = np.roll(np_lesser, -1, axis=1)
+    np_lower = np_lesser & ~np_rlesser # find True w/ False to right
+
+    np_greater = np_frac > target
+    np_rgreater = np.roll(np_greater, 1, axis=1)
+    np_upper = np_greater & ~np_rgreater # find True w/ False to left
+
+    lower_frac = np_frac[np_lower]
+    upper_frac = np_frac[np_upper]
+    lower = np_cols[np.argmax(np_lower, axis=1)] # lower size classes
+    upper = np_cols[np.argmax(np_upper, axis=1)] # upper size classes
+    equal = np_cols[np.argmax(np_equal, axis=1)] # equal size class
+    equal_rows = np_equal.any(axis=1)
+
+    lower_psi = np.log2(lower)
+    upper_psi = np.log2(upper)
+
+    Di_psi = lower_psi + (target - lower_frac) * (upper_psi - lower_psi) /\
+                        (upper_frac - lower_frac)
+    Di = 2**Di_psi
+    Di[equal_rows] = equal[equal_rows]
+
+    # Add the null values back in to make the array the same size
+    notnull_fractional.loc[okay_rows, name] = Di
+    out = pd.Series(index=raw_data.index, name=name)
+    out.loc[notnull_idx] = notnull_fractional[name]
+
+    return out
+
+
+@pytest.fixture
+def sieve_data():
+    """Random sieve masses with some awkward rows mixed in."""
+    sizes = [0.5, 1, 2, 4, 5.6, 8, 11.2, 16, 22.6, 32]
+    rng = np.random.default_rng(42)
+    masses = rng.random((200, len(sizes))) * 100
+    masses[rng.random(masses.shape) < 0.2] = 0 # empty size classes
+    masses[3, 4] = np.nan # null row
+    masses[5, :] = 0 # no mass at all
+    masses[7, :] = [25, 25, 50, 0, 0, 0, 0, 0, 0, 0] # exactly D50 at 1 mm
+    masses[9, :] = [0, 0, 0, 0, 0, 0, 0, 0, 0, 10] # all in the last class
+    index = pd.Index(np.arange(200) * 2, name='sample')
+    return pd.DataFrame(masses, index=index, columns=sizes)
+
+
+class TestCalcDi:
+
+    @pytest.mark.parametrize("target", [5, 16, 'D50', 84, 95])
+    def test_matches_reference(self, sieve_data, target):
+        Di = calc_Di(sieve_data, target)
+        expected = _reference_calc_Di(sieve_data, target)
+        assert Di.name == expected.name
+        assert Di.index.equals(expected.index)
+        assert_array_equal(Di.values, expected.values.astype(float))
+
+
+class TestCalcDiArray:
+
+    def test_reused_workspace_and_out(self, sieve_data):
+        expected = calc_Dis(sieve_data, [16, 84]).values
+        masses = sieve_data.values
+        sizes = sieve_data.columns.values
+        workspace = DiWorkspace(150, masses.shape[1], 2)
+        out = np.empty((100, 2))
+        for start in [0, 100]:
+            Dis = calc_Di_array(masses[start:start + 100], sizes, [16, 84],
+                    out=out, workspace=workspace)
+            assert Dis is out
+            assert_array_equal(out, expected[start:start + 100])
+
+
+class TestCalcDis:
+
+    def test_matches_calc_Di(self, sieve_data):
+        targets = [16, 'D50', 84, 90]
+        Dis = calc_Dis(sieve_data, targets)
+        assert list(Dis.columns) == ['D16', 'D50', 'D84', 'D90']
+        assert Dis.index.equals(sieve_data.index)
+        for target in targets:
+            Di = calc_Di(sieve_data, target)
+            assert_array_equal(Dis[Di.name].values, Di.values.astype(float))
+
+    def test_special_rows(self, sieve_data):
+        Dis = calc_Dis(sieve_data, [50])
+        assert np.isnan(Dis.loc[6, 'D50']) # null row
+        assert np.isnan(Dis.loc[10, 'D50']) # no mass
+        assert Dis.loc[14, 'D50'] == 1 # exact match
+        assert 22.6 < Dis.loc[18, 'D50'] < 32 # interpolated in last class
+
+    def test_bad_target(self, sieve_data):
+        with pytest.raises(AssertionError):
+            calc_Dis(sieve_data, [50, 100])
+
+
+class TestCalcDiChunked:
+
+    def test_matches_calc_Dis(self, sieve_data):
+        expected = calc_Dis(sieve_data, [16, 50, 84])
+        chunks = (sieve_data.iloc[i:i + 64] for i in range(0, 200, 64))
+        out = calc_Di_chunked(chunks, [16, 50, 84])
+        assert_array_equal(out, expected.values)
+
+    def test_array_chunks_into_out(self, sieve_data):
+        expected = calc_Di(sieve_data, 50)
+        sizes = sieve_data.columns.values
+        values = sieve_data.values
+        chunks = (values[i:i + 30] for i in range(0, 200, 30))
+        out = np.full(200, -1.0)
+        calc_Di_chunked(chunks, 'D50', sizes=sizes, out=out)
+        assert_array_equal(out, expected.values.astype(float))
+
+    def test_wrong_out_length(self, sieve_data):
+        with pytest.raises(AssertionError):
+            calc_Di_chunked([sieve_data], 50, out=np.empty(300))
+
+
+class TestCalcDiParallel:
+
+    @pytest.mark.parametrize("use_threads", [True, False])
+    def test_matches_calc_Dis(self, sieve_data, use_threads):
+        expected = calc_Dis(sieve_data, [16, 50, 84])
+        Dis = calc_Di_parallel(sieve_data, [16, 50, 84], n_workers=2,
+                n_partitions=3, use_threads=use_threads)
+        assert Dis.index.equals(sieve_data.index)
+        assert list(Dis.columns) == list(expected.columns)
+        assert_array_equal(Dis.values, expected.values)
+
+    def test_single_target(self, sieve_data):
+        Di = calc_Di_parallel(sieve_data, 'D50', n_workers=2)
+        assert_array_equal(Di.values, calc_Di(sieve_data, 50).values)
+        assert Di.name == 'D50'
+
+
+class TestGrainSizeDistribution:
+
+    def test_Di_matches_calc_Dis(self, sieve_data):
+        gsd = GrainSizeDistribution(sieve_data)
+        expected = calc_Dis(sieve_data, [16, 50, 84])
+        Dis = gsd.Di([16, 50, 84])
+        assert_array_equal(Dis.values, expected.values)
+        assert Dis.index.equals(sieve_data.index)
+
+    def test_exact_class_match(self):
+        # 5.6 and 11.2 aren't powers of 2, so 2**log2(size) != size
+        sizes = [2.8, 5.6, 11.2]
+        data = pd.DataFrame([[1, 1, 2], [0, 1, 1]], columns=sizes)
+        gsd = GrainSizeDistribution(data)
+        assert gsd.stats() is not None # fills the psi cache first
+        Dis = gsd.Di([50])
+        assert list(Dis['D50']) == [5.6, 5.6]
+        assert_array_equal(Dis.values, calc_Dis(data, [50]).values)
+
+    def test_folk_ward(self):
+        # Log-uniform masses between 1 and 16 mm (psi 0 to 4): symmetric, so 
+        # no skewness, with mean at psi 2
+        sizes = 2.0**np.arange(0, 5)
+        data = pd.DataFrame([[0, 1, 1, 1, 1]], columns=sizes)
+        stats = GrainSizeDistribution(data).stats()
+        assert stats['mean_psi'][0] == pytest.approx(2)
+        assert stats['Dg'][0] == pytest.approx(4)
+        assert stats['skewness'][0] == pytest.approx(0)
+        # sorting = (3.36 - 0.64)/4 + (3.8 - 0.2)/6.6
+        assert stats['sorting'][0] == pytest.approx(0.68 + 3.6/6.6)
+        # kurtosis = 3.6 / (2.44 * 2)
+        assert stats['kurtosis'][0] == pytest.approx(3.6 / 4.88)
+        assert list(stats.to_dataframe().columns) == \
+                list(GrainSizeDistribution.stat_names)
+
+    def test_caching(self, sieve_data):
+        gsd = GrainSizeDistribution(sieve_data)
+        assert gsd.fractions is gsd.fractions
+        assert gsd.stats() is gsd.stats()
+
+    def test_fraction_finer(self, sieve_data):
+        gsd = GrainSizeDistribution(sieve_data)
+        curve = gsd.fraction_finer()
+        assert_array_equal(curve.values, gsd.fractions)
+        finer = gsd.fraction_finer([0.1, 2, 64])
+        assert_array_equal(finer[2.0].values, curve[2.0].values)
+        assert (finer.loc[0, 0.1] == 0) and (finer.loc[0, 64.0] == 1)
+        assert finer.loc[6].isnull().all() # null row
+
+
+class TestIncrementalDiCalculator:
+
+    def test_appended_rows(self, sieve_data):
+        calculator = IncrementalDiCalculator([16, 50, 84])
+        start = 0
+        for stop in [10, 11, 11, 80, 200]:
+            # Only the new rows are returned
+            new_rows = calculator.update(sieve_data.iloc[:stop])
+            expected = calc_Dis(sieve_data.iloc[:stop], [16, 50, 84])
+            assert new_rows.index.equals(expected.index[start:])
+            assert_array_equal(new_rows.values, expected.values[start:])
+            results = calculator.results
+            assert results.index.equals(expected.index)
+            assert_array_equal(results.values, expected.values)
+            start = stop
+
+        # results is a copy
+        results.iloc[0] = -1
+        assert (calculator.results.values[0] != -1).all()
+
+    def test_only_new_rows_calculated(self, sieve_data):
+        calculator = IncrementalDiCalculator([50])
+        calculator.update(sieve_data.iloc[:100])
+        # Corrupt an old row without telling the calculator. It should not 
+        # be recalculated.
+        data = sieve_data.copy()
+        data.iloc[0] = [1, 0, 0, 0, 0, 0, 0, 0, 0, 1]
+        new_rows = calculator.update(data)
+        assert new_rows.index.equals(data.index[100:])
+        assert_array_equal(new_rows['D50'].values,
+                calc_Di(data, 50).values[100:])
+        results = calculator.results
+        assert results['D50'].iloc[0] == calc_Di(sieve_data, 50).iloc[0]
+
+    @pytest.mark.parametrize("use_invalidate", [True, False])
+    def test_changed_rows(self, sieve_data, use_invalidate):
+        calculator = IncrementalDiCalculator([50])
+        calculator.update(sieve_data)
+        data = sieve_data.copy()
+        label = data.index[0]
+        data.loc[label] = [1, 0, 0, 0, 0, 0, 0, 0, 0, 1]
+        if use_invalidate:
+            calculator.invalidate([label])
+            changed_rows = calculator.update(data)
+        else:
+            changed_rows = calculator.update(data, changed=[label])
+        assert list(changed_rows.index) == [label]
+        assert_array_equal(calculator.results['D50'].values,
+                calc_Di(data, 50).values)
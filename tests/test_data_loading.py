@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_array_equal
+
+from helpyr.data_loading import DataLoader
+from helpyr.Di_calculator import calc_Dis
+from helpyr.logger import Logger
+
+
+@pytest.fixture
+def loader(tmp_path):
+    logger = Logger(None, default_verbose=False)
+    return DataLoader(str(tmp_path), logger=logger)
+
+@pytest.fixture
+def sieve_data():
+    sizes = [0.5, 1, 2, 4, 8, 16]
+    rng = np.random.default_rng(3)
+    masses = rng.random((50, len(sizes))) * 10
+    masses[2, 1] = np.nan
+    masses[4, :] = 0
+    return pd.DataFrame(masses, index=pd.Index(np.arange(50) + 100,
+        name='sample'), columns=sizes)
+
+
+class TestDiCurves:
+
+    def test_round_trip(self, loader, sieve_data):
+        original = sieve_data.copy()
+        loader.produce_pickles({'sieve': sieve_data, 'other': [1, 2]},
+                verbose=False, Di_curves=['sieve'])
+        assert_array_equal(sieve_data.values, original.values)
+        assert not os.path.isdir(os.path.join(loader.source_dir,
+            'other_Di_curves'))
+
+        gsd = loader.load_Di_curves('sieve')
+        assert isinstance(gsd.fractions, np.memmap)
+        expected = calc_Dis(sieve_data, [10, 50, 90])
+        Dis = gsd.Di([10, 50, 90])
+        assert Dis.index.equals(sieve_data.index)
+        assert_array_equal(Dis.values, expected.values)
+
+        arrays = loader.load_Di_curve_arrays('sieve')
+        assert_array_equal(arrays['notnull'],
+                sieve_data.notnull().all(axis=1).values)
+        assert_array_equal(arrays['sizes'], sieve_data.columns.values)
+
+    def test_single_name(self, loader, sieve_data):
+        # A name is not matched as a substring of another name
+        loader.produce_pickles({'sieve': sieve_data, 'sie': sieve_data},
+                verbose=False, Di_curves='sieve')
+        assert os.path.isdir(os.path.join(loader.source_dir,
+            'sieve_Di_curves'))
+        assert not os.path.isdir(os.path.join(loader.source_dir,
+            'sie_Di_curves'))
+
+    def test_existing_curves_kept(self, loader, sieve_data):
+        loader.produce_pickles({'sieve': sieve_data}, verbose=False,
+                Di_curves=True)
+        changed = sieve_data * 0 + 1
+        loader.produce_pickles({'sieve': changed}, verbose=False,
+                Di_curves=True)
+        gsd = loader.load_Di_curves('sieve')
+        assert_array_equal(gsd.Di([50]).values,
+                calc_Dis(sieve_data, [50]).values)
+
+        loader.produce_pickles({'sieve': changed}, verbose=False,
+                overwrite=True, Di_curves=True)
+        gsd = loader.load_Di_curves('sieve', mmap_mode=None)
+        assert_array_equal(gsd.Di([50]).values,
+                calc_Dis(changed, [50]).values)
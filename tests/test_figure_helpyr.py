@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from helpyr.figure_helpyr import FigureSaver
+from helpyr.figure_helpyr import StableSubplots
+from helpyr.figure_helpyr import decimate_minmax
+from helpyr.figure_helpyr import lttb
+from helpyr.figure_helpyr import plot_decimated
+from helpyr.logger import quiet_logger
+
+
+@pytest.fixture
+def figure():
+    fig = plt.figure(figsize=(4, 3))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.plot(np.linspace(0, 1, 50), np.linspace(0, 1, 50)**2)
+    ax.set_title("test")
+    yield fig
+    plt.close(fig)
+
+def _saver(root, **kwargs):
+    return FigureSaver(figure_root_dir=str(root), logger=quiet_logger(),
+            **kwargs)
+
+def _record_many(saver, prefix, n):
+    # Worker: record fingerprints for n files
+    for i in range(n):
+        saver._record_fingerprint(
+                os.path.join(saver.figure_root_dir, f"{prefix}_{i}.png"), i)
+
+
+class TestAsyncSaving:
+
+    @pytest.mark.parametrize("extension, rc", [
+        ('png', {}),
+        ('pdf', {}),
+        ('png', {'savefig.bbox': 'tight', 'savefig.transparent': True}),
+        ('png', {'savefig.facecolor': 'red'}),
+        ])
+    def test_async_matches_sync(self, tmp_path, figure, extension, rc):
+        with plt.rc_context(rc):
+            self._save_both(tmp_path, figure, extension)
+
+    def _save_both(self, tmp_path, figure, extension):
+        sync_saver = _saver(tmp_path / 'sync', figure_extension=extension)
+        async_saver = _saver(tmp_path / 'async', figure_extension=extension,
+                async_workers=2, max_queue=1)
+        for name in ['a', 'b', 'c']:
+            sync_saver.save_figure(figure_name=name, figure=figure, dpi=50)
+            async_saver.save_figure(figure_name=name, figure=figure, dpi=50)
+        async_saver.close()
+
+        for name in ['a', 'b', 'c']:
+            sync_path = tmp_path / 'sync' / f"{name}.{extension}"
+            async_path = tmp_path / 'async' / f"{name}.{extension}"
+            assert async_path.stat().st_size > 0
+            if extension == 'png':
+                assert np.array_equal(plt.imread(sync_path),
+                        plt.imread(async_path))
+
+    def test_errors_propagate(self, tmp_path, figure):
+        saver = _saver(tmp_path, async_workers=1)
+        saver.save_figure(figure_name=os.path.join('missing_dir', 'a'),
+                figure=figure)
+        with pytest.raises(FileNotFoundError):
+            saver.wait()
+        # Errors are only raised once
+        saver.wait()
+        saver.close()
+
+
+class TestParallelFinish:
+
+    def test_parallel_matches_serial(self, tmp_path):
+        names = ['fig_a', 'fig_b', 'fig_c']
+        for subdir, parallel in [('serial', False), ('parallel', True)]:
+            stable = StableSubplots(logger=quiet_logger())
+            for name in names:
+                for i in range(2):
+                    ax = stable.add_subplot(name, subplots_shape=(1, 2),
+                            fig_kwargs={'figsize': (4, 2)})
+                    ax.plot([0, 1, 2], [i, len(name), 0])
+            saver = _saver(tmp_path / subdir)
+            stable.finish(show=False, saving_fu=saver.save_figure,
+                    parallel=parallel, n_workers=2)
+            assert StableSubplots.existing_plots == {}
+
+        assert plt.get_fignums() == []
+        for name in names:
+            serial = plt.imread(tmp_path / 'serial' / f"{name}.png")
+            parallel = plt.imread(tmp_path / 'parallel' / f"{name}.png")
+            assert np.array_equal(serial, parallel)
+
+    def test_unpicklable_saving_fu(self, tmp_path):
+        # The figures are kept if saving_fu can't be sent to the workers
+        saver = _saver(tmp_path)
+        stable = StableSubplots(logger=quiet_logger())
+        try:
+            for name in ['fig_a', 'fig_b']:
+                stable.add_subplot(name).plot([0, 1], [1, 0])
+            # Local objects raise AttributeError when pickled
+            with pytest.raises((pickle.PicklingError, AttributeError)):
+                stable.finish(show=False, parallel=True, n_workers=1,
+                        saving_fu=lambda **kwargs: saver.save_figure(**kwargs))
+            assert list(StableSubplots.existing_plots) == ['fig_a', 'fig_b']
+            assert len(plt.get_fignums()) == 2
+        finally:
+            StableSubplots.existing_plots.clear()
+            plt.close('all')
+
+
+class TestFingerprints:
+
+    def test_unchanged_figures_skipped(self, tmp_path, figure):
+        saver = _saver(tmp_path)
+        filepath = tmp_path / 'a.png'
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='auto')
+        os.utime(filepath, ns=(0, 0))
+
+        # A new saver reads the manifest and skips the identical figure
+        saver = _saver(tmp_path)
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='auto')
+        assert filepath.stat().st_mtime_ns == 0
+
+        # Changing the data or the savefig options saves again
+        figure.axes[0].lines[0].set_ydata(np.linspace(1, 0, 50))
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='auto')
+        assert filepath.stat().st_mtime_ns != 0
+        os.utime(filepath, ns=(0, 0))
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='auto',
+                dpi=20)
+        assert filepath.stat().st_mtime_ns != 0
+
+    def test_drawn_figures_skipped(self, tmp_path):
+        # Legends and colormapped collections are laid out or colored when 
+        # drawing. That shouldn't change the fingerprint.
+        fig = plt.figure(figsize=(4, 3))
+        ax = fig.add_subplot(1, 1, 1)
+        ax.plot([0, 1], [0, 1], label='line')
+        points = ax.scatter(np.arange(5), np.arange(5), c=np.arange(5),
+                label='points')
+        fig.colorbar(points)
+        ax.legend()
+        filepath = tmp_path / 'a.png'
+        try:
+            for i in range(3):
+                _saver(tmp_path).save_figure(figure_name='a', figure=fig,
+                        fingerprint='auto')
+                if i == 0:
+                    os.utime(filepath, ns=(0, 0))
+                else:
+                    assert filepath.stat().st_mtime_ns == 0
+
+            # The colormapped data is still covered
+            points.set_array(np.arange(5)[::-1])
+            _saver(tmp_path).save_figure(figure_name='a', figure=fig,
+                    fingerprint='auto')
+            assert filepath.stat().st_mtime_ns != 0
+        finally:
+            plt.close(fig)
+
+    def test_explicit_fingerprint_and_missing_file(self, tmp_path, figure):
+        saver = _saver(tmp_path, async_workers=1)
+        filepath = tmp_path / 'a.png'
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='v1')
+        saver.wait()
+        os.utime(filepath, ns=(0, 0))
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='v1')
+        assert filepath.stat().st_mtime_ns == 0
+
+        # Deleted files are saved again even if the fingerprint matches
+        filepath.unlink()
+        saver.save_figure(figure_name='a', figure=figure, fingerprint='v1')
+        saver.close()
+        assert filepath.is_file()
+
+    def test_concurrent_manifest_updates(self, tmp_path):
+        # Processes updating the manifest at once don't lose entries
+        saver = _saver(tmp_path)
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(_record_many, saver, prefix, 25)
+                    for prefix in 'abcd']
+            for future in futures:
+                future.result()
+        with open(saver.manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        assert len(manifest) == 100
+
+
+class TestBoundedSubplots:
+
+    @pytest.fixture(autouse=True)
+    def clean_plots(self):
+        yield
+        StableSubplots.existing_plots.clear()
+        plt.close('all')
+
+    def test_auto_finish(self, tmp_path):
+        saver = _saver(tmp_path)
+        stable = StableSubplots(logger=quiet_logger(), auto_finish=True,
+                saving_fu=saver.save_figure)
+        for i in range(3):
+            ax = stable.add_subplot('grid', subplots_shape=(1, 2))
+            # The filled figure stays open until the next call
+            assert len(StableSubplots.existing_plots) == 1
+            ax.plot([0, 1], [i, i])
+        # The first grid was finished when the third axis was requested
+        assert (tmp_path / 'grid.png').is_file()
+        assert len(StableSubplots.existing_plots['grid'][1]) == 1
+        assert len(plt.get_fignums()) == 1
+
+    def test_lru_cap(self, tmp_path):
+        saver = _saver(tmp_path)
+        stable = StableSubplots(logger=quiet_logger(), max_open=2,
+                saving_fu=saver.save_figure)
+        stable.add_subplot('a', subplots_shape=(2, 1))
+        stable.add_subplot('b', subplots_shape=(2, 1))
+        stable.add_subplot('a', subplots_shape=(2, 1)) # 'b' is now oldest
+        stable.add_subplot('c', subplots_shape=(2, 1))
+        assert list(StableSubplots.existing_plots) == ['a', 'c']
+        assert (tmp_path / 'b.png').is_file()
+        assert len(plt.get_fignums()) == 2
+
+        stable.finish(show=False)
+        assert sorted(os.listdir(tmp_path)) == ['a.png', 'b.png', 'c.png']
+        assert plt.get_fignums() == []
+
+
+class TestLargeData:
+
+    @pytest.fixture
+    def series(self):
+        rng = np.random.default_rng(0)
+        x = np.sort(rng.random(100000)) * 50
+        y = np.sin(x) + rng.normal(scale=0.1, size=x.size)
+        return x, y
+
+    def test_minmax_keeps_extremes(self, series):
+        x, y = series
+        dx, dy = decimate_minmax(x, y, 100)
+        assert len(dx) <= 400
+        assert np.all(np.diff(dx) >= 0)
+        # Every bin keeps its extremes and the end points are kept
+        bins = np.minimum((x / x[-1] * 100).astype(int), 99)
+        dbins = np.minimum((dx / x[-1] * 100).astype(int), 99)
+        for b in [0, 37, 99]:
+            assert dy[dbins == b].min() == y[bins == b].min()
+            assert dy[dbins == b].max() == y[bins == b].max()
+        assert (dx[0], dx[-1]) == (x[0], x[-1])
+
+    def test_lttb(self, series):
+        x, y = series
+        dx, dy = lttb(x, y, 500)
+        assert len(dx) == 500
+        assert (dx[0], dx[-1]) == (x[0], x[-1])
+        assert np.all(np.diff(dx) > 0)
+        assert np.isin(dy, y).all()
+        # Short lines are returned unchanged
+        short_x, short_y = lttb(x[:10], y[:10], 500)
+        assert np.array_equal(short_y, y[:10])
+
+    def test_plot_decimated(self, series, figure):
+        x, y = series
+        ax = figure.axes[0]
+        line, = plot_decimated(ax, x, y, color='k')
+        n_pixels = ax.get_window_extent().width
+        assert len(line.get_xdata()) <= 4 * np.ceil(n_pixels)
+        assert line.get_color() == 'k'
+
+        with pytest.raises(ValueError, match="'minmax' or 'lttb'"):
+            plot_decimated(ax, x, y, method='mean')
+
+    def test_rasterize_threshold(self, tmp_path, figure, series):
+        x, y = series
+        ax = figure.axes[0]
+        ax.plot(x, y)
+        vector_saver = _saver(tmp_path / 'vector', figure_extension='svg')
+        raster_saver = _saver(tmp_path / 'raster', figure_extension='svg',
+                rasterize_threshold=1000)
+        vector_saver.save_figure(figure_name='a', figure=figure)
+        raster_saver.save_figure(figure_name='a', figure=figure)
+        vector_size = (tmp_path / 'vector' / 'a.svg').stat().st_size
+        raster_size = (tmp_path / 'raster' / 'a.svg').stat().st_size
+        assert raster_size < vector_size / 5
+        # The artists are restored afterwards
+        assert not any(line.get_rasterized() for line in ax.lines)
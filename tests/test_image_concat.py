@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from helpyr.image_concat import ImageConcatenator
+from helpyr.image_splitter import ImageSplitter
+from helpyr.logger import quiet_logger
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 256, (103, 20, 3), dtype=np.uint8)
+
+def _split(tmp_path, image, overlap):
+    image_path = str(tmp_path / 'image.png')
+    Image.fromarray(image).save(image_path)
+    splitter = ImageSplitter(strip_width=10, overlap=overlap, n_workers=0,
+            output_template='strip_{}.png', logger=quiet_logger())
+    return splitter.split(image_path, str(tmp_path / 'strips'))
+
+
+class TestImageConcatenator:
+
+    def test_find_strips_orders_by_id(self, tmp_path, image):
+        _split(tmp_path, image, 0)
+        (tmp_path / 'strips' / 'notes.txt').write_text("no id")
+        concatenator = ImageConcatenator(logger=quiet_logger())
+        strips = concatenator.find_strips(str(tmp_path / 'strips'))
+        assert [concatenator.strip_id(path) for path in strips] == \
+                list(range(10))
+
+    @pytest.mark.parametrize("overlap", [0, 3])
+    @pytest.mark.parametrize("extension", ['png', 'npy'])
+    def test_round_trip(self, tmp_path, image, overlap, extension):
+        _split(tmp_path, image, overlap)
+        concatenator = ImageConcatenator(overlap=overlap, n_workers=3,
+                logger=quiet_logger())
+        output_path = str(tmp_path / 'out' / f"image.{extension}")
+        concatenator.concat_dir(str(tmp_path / 'strips'), output_path)
+        if extension == 'npy':
+            result = np.load(output_path)
+        else:
+            with Image.open(output_path) as output:
+                result = np.asarray(output)
+        assert np.array_equal(result, image)
+        # No temporary arrays left behind
+        assert [p.name for p in (tmp_path / 'out').iterdir()] == \
+                [f"image.{extension}"]
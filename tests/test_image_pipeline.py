@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import csv
+import os
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from helpyr import image_pipeline
+
+
+def _read_report(path):
+    with open(path, newline='') as report_file:
+        return list(csv.DictReader(report_file))
+
+
+def test_split_then_concat(tmp_path, capsys):
+    rng = np.random.default_rng(2)
+    images = {}
+    for name in ['run_1/lower', 'run_2/lower']:
+        images[name] = rng.integers(0, 256, (64, 16, 3), dtype=np.uint8)
+        os.makedirs(tmp_path / 'photos' / os.path.dirname(name),
+                exist_ok=True)
+        Image.fromarray(images[name]).save(tmp_path / 'photos' / f"{name}.png")
+
+    split_args = [str(tmp_path / 'photos'), '--output-dir',
+            str(tmp_path / 'strips'), '--strip-width', '10',
+            '--template', 'strip_{}.png', '--workers', '2']
+    assert image_pipeline.main(['split'] + split_args) == 0
+    assert len(os.listdir(tmp_path / 'strips' / 'run_1' / 'lower')) == 6 + 1
+    rows = _read_report(tmp_path / 'strips' / 'split_report.csv')
+    assert [row['status'] for row in rows] == ['done', 'done']
+    assert "[2/2]" in capsys.readouterr().out
+
+    # Finished jobs are skipped on reruns
+    assert image_pipeline.main(['split'] + split_args) == 0
+    rows = _read_report(tmp_path / 'strips' / 'split_report.csv')
+    assert [row['status'] for row in rows] == ['skipped', 'skipped']
+
+    report_path = str(tmp_path / 'concat.csv')
+    assert image_pipeline.main(['concat', str(tmp_path / 'strips'),
+        '--output-dir', str(tmp_path / 'joined'), '--extension', '.png',
+        '--workers', '2', '--report', report_path]) == 0
+    rows = _read_report(report_path)
+    assert [row['n_files'] for row in rows] == ['6', '6']
+    for name, image in images.items():
+        with Image.open(tmp_path / 'joined' / f"{name}.png") as joined:
+            assert np.array_equal(np.asarray(joined), image)
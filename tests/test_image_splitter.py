@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from helpyr.image_splitter import ImageSplitter
+from helpyr.image_splitter import add_rainbow_stripe
+from helpyr.logger import quiet_logger
+
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    arrays = [rng.integers(0, 256, (n_rows, 30, 3), dtype=np.uint8)
+            for n_rows in (100, 47)]
+    paths = []
+    for i, array in enumerate(arrays):
+        paths.append(str(tmp_path / f"image_{i}.png"))
+        Image.fromarray(array).save(paths[-1])
+    return arrays, paths
+
+def _read(path):
+    with Image.open(path) as image:
+        return np.asarray(image)
+
+
+class TestImageSplitter:
+
+    def test_strip_bounds(self):
+        splitter = ImageSplitter(strip_width=45, overlap=3)
+        # Same strips as np.array_split, plus the overlap
+        assert splitter.strip_bounds(100) == [(0, 53), (50, 100)]
+        assert ImageSplitter(strip_width=45).strip_bounds(20) == [(0, 20)]
+
+    @pytest.mark.parametrize("n_workers", [0, 2])
+    def test_split_many(self, tmp_path, images, n_workers):
+        arrays, paths = images
+        splitter = ImageSplitter(strip_width=20, overlap=2, 
+                output_template='strip_{}.png', n_workers=n_workers,
+                cache_dir=str(tmp_path), logger=quiet_logger())
+        block_rows = ImageSplitter.block_rows
+        ImageSplitter.block_rows = 16 # Decode in several blocks
+        try:
+            outputs = splitter.split_many(paths, str(tmp_path / 'strips'),
+                    start_id=10)
+        finally:
+            ImageSplitter.block_rows = block_rows
+
+        assert len(outputs) == 5 + 2
+        assert outputs[0].endswith('strip_10.png')
+        assert outputs[-1].endswith('strip_16.png')
+        expected = []
+        for array in arrays:
+            for start, stop in splitter.strip_bounds(len(array)):
+                expected.append(array[start:stop])
+        for path, strip in zip(outputs, expected):
+            assert np.array_equal(_read(path), strip)
+        # The caches are removed
+        assert sorted(p.name for p in tmp_path.iterdir()) == \
+                ['image_0.png', 'image_1.png', 'strips']
+
+    def test_npy_source(self, tmp_path, images):
+        arrays, paths = images
+        npy_path = str(tmp_path / 'image.npy')
+        np.save(npy_path, arrays[0])
+        splitter = ImageSplitter(strip_width=50, n_workers=0,
+                output_template='{}.png', logger=quiet_logger())
+        outputs = splitter.split(npy_path, str(tmp_path / 'strips'))
+        assert np.array_equal(_read(outputs[1]), arrays[0][50:])
+
+    def test_max_pixels(self, tmp_path, images, monkeypatch):
+        arrays, paths = images
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        output_dir = str(tmp_path / 'strips')
+        # 100 x 30 is over twice Pillow's limit
+        with pytest.raises(Image.DecompressionBombError):
+            ImageSplitter(n_workers=0, logger=quiet_logger()).split(paths[0],
+                    output_dir)
+
+        splitter = ImageSplitter(strip_width=50, output_template='{}.png',
+                n_workers=0, max_pixels=3000, logger=quiet_logger())
+        outputs = splitter.split(paths[0], output_dir)
+        assert Image.MAX_IMAGE_PIXELS == 1000
+        with pytest.raises(AssertionError):
+            ImageSplitter(n_workers=0, max_pixels=2999,
+                    logger=quiet_logger()).split(paths[0], output_dir)
+
+        monkeypatch.undo()
+        assert np.array_equal(_read(outputs[0]), arrays[0][:50])
+
+    def test_rainbow_stripe(self):
+        image = np.zeros((60, 80, 3), dtype=np.uint8)
+        add_rainbow_stripe(image, width=10)
+        assert (image[:, 10:] == 0).all()
+        assert (image[0, :10] == [255, 0, 0]).all()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import subprocess
+import sys
+
+import pytest
+
+heavy_modules = ['numpy', 'pandas', 'matplotlib', 'scipy', 'PIL']
+
+
+def _imported_modules(statement):
+    # Run the import in a fresh interpreter and return the imported module 
+    # names from the -X importtime report
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+        statement], capture_output=True, text=True, check=True)
+    names = set()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            names.add(line.split('|')[-1].strip())
+    assert names, result.stderr
+    return names
+
+def _heavy(names, allowed=()):
+    return sorted(name for name in names
+            if name.split('.')[0] in heavy_modules
+            and name.split('.')[0] not in allowed)
+
+
+@pytest.mark.parametrize("statement", [
+    "import helpyr",
+    "import helpyr.helpyr_misc",
+    "import helpyr.kwarg_checker",
+    "import helpyr.logger",
+    "import helpyr.crawler",
+    "from helpyr.data_loading import DataLoader",
+    ])
+def test_light_imports(statement):
+    assert _heavy(_imported_modules(statement)) == []
+
+def test_figure_helpyr_defers_matplotlib():
+    names = _imported_modules("import helpyr.figure_helpyr")
+    assert _heavy(names, allowed=['numpy']) == []
+
+def test_lazy_submodule_attribute():
+    # The -X importtime report only lists the imports run by the module 
+    # that importlib.import_module loads, not that module itself, so check 
+    # sys.modules instead
+    result = subprocess.run([sys.executable, '-c', "; ".join([
+        "import sys, helpyr",
+        "assert 'helpyr.kwarg_checker' not in sys.modules",
+        "helpyr.kwarg_checker.check_kwarg({}, 'a')",
+        "print('\\n'.join(sys.modules))",
+        ])], capture_output=True, text=True, check=True)
+    names = set(result.stdout.split())
+    assert 'helpyr.kwarg_checker' in names
+    assert 'helpyr.Di_calculator' not in names
+    assert _heavy(names) == []
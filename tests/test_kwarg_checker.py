@@ -6,6 +6,7 @@
 #            [output_dir]
 
 import pytest
+import numpy as np
 from numpy import ndarray
 from helpyr.kwarg_checker import check_kwarg
 from helpyr.kwarg_checker import get_check_kwarg_fu
@@ -13,6 +14,10 @@ from helpyr.kwarg_checker import check_add_kwarg
 from helpyr.kwarg_checker import get_check_add_kwarg_fu
 from helpyr.kwarg_checker import KwargChecker
 from helpyr.kwarg_checker import _assert_types
+from helpyr.kwarg_checker import _compile_arg_type
+from helpyr.kwarg_checker import check_kwargs
+from helpyr.kwarg_checker import set_kwarg_validation
+from helpyr.kwarg_checker import KwargSpec
 
 def _assert_equal(a, b):
     """Check if two arbitrary variables are equal.
@@ -85,6 +90,8 @@ class TestAssertTypes:
         ((1.0,2.0,3.0), 'tuple-float'),
         (tuple('abc'), 'tuple'),
         (tuple('abc'), 'tuple-str'),
+        ([1,2,3], 'list-int-pos'),
+        ([None,2,3], 'list-int-none'),
         ])
     def test__assert_types_passing(self, val, arg_type):
         """Make sure _assert_types returns empty (as opposed raising an 
@@ -124,6 +131,7 @@ class TestAssertTypes:
         ([1.0,2.0,3.0], 'list-int'), # Wrong element type
         ((1,2,3), 'tuple-float'),     # Wrong element type
         ((1.0,2.0,3.0), 'tuple-int'), # Wrong element type
+        ([1,0,3], 'list-int-pos'),    # Wrong element sign
         
         # Check some type casting
         ('abc', 'float_tcast'),
@@ -157,6 +165,8 @@ class TestAssertTypes:
         ('1.0', 'int_float_tcast', float),
         ('1',   'float_int_tcast', float),
         ('1.0', 'float_int_tcast', float),
+        (1.0, 'int_float_tcast', float),
+        (1, 'float_int_tcast', int),
         (1, 'str_tcast', str),
         (1, 'bool_tcast', bool),
         ((1,2,3), 'tuple-float-tcast', [float, float, float]),
@@ -175,6 +185,12 @@ class TestAssertTypes:
 
 
 
+    def test_compiled_specs_cached(self):
+        """Make sure each arg_type string is only parsed once."""
+        assert _compile_arg_type('int-pos') is _compile_arg_type('int-pos')
+        assert _compile_arg_type('list-int').element_spec \
+                is _compile_arg_type('int')
+
 
 @pytest.fixture
 def simple_input_kwargs():
@@ -301,6 +317,18 @@ class TestCheckKwarg:
             assert type(out) is type(val) is val_type
 
 
+    @pytest.mark.parametrize("val, arg_type", [
+        (1, 'int-float-tcast'),
+        (1.5, 'int-float-tcast'),
+        (1, 'float-int-tcast'),
+        (1.5, 'float-int-tcast'),
+        ])
+    def test_multi_type_casting_matching_values(self, val, arg_type):
+        """Values that already have one of the accepted types keep it."""
+        out = check_kwarg({'a': val}, 'a', arg_type=arg_type)
+        assert out == val
+        assert type(out) is type(val)
+
 
 class TestCheckAddKwarg:
     """Test check_add_kwarg."""
@@ -403,6 +431,153 @@ class TestCheckAddKwarg:
 
 
 
+class TestVectorizedChecks:
+    """Test numpy arrays and long sequences."""
+
+    @pytest.mark.parametrize("n", [3, 1000])
+    @pytest.mark.parametrize("val, arg_type", [
+    # parameters: val, arg_type
+        ([1, 2, True], 'list-int-pos-tcast'),
+        ([1.0, 2.5, 3.0], 'list-float-whole-tcast'),
+        ((1.0, -2.5, -3.0), 'tuple-float-tcast'),
+        (['a', 'b', 'c'], 'list-str-tcast'),
+        ([1, '2', 3.0], 'list-int-tcast'), # needs casting
+        ([2**70, 1, 2], 'list-int-tcast'), # too big for numpy ints
+        ([2**63, 1, 2], 'list-int-tcast'), # inferred as float64
+        ([2**63, -1, 2], 'list-int-tcast'), # negative and huge mix
+        ([2**64 - 1, 1], 'list-int-tcast'), # inferred as uint64
+        ([2**63 + 1, 1], 'list-float-tcast'),
+        ])
+    def test_long_sequences_match_short(self, n, val, arg_type):
+        """Long sequences take the vectorized path but give the same 
+        results."""
+        val = type(val)(list(val) * n)
+        out = check_kwarg({'x': val}, 'x', arg_type=arg_type)
+        expected = [_compile_arg_type(arg_type).element_spec.handles(v)
+                for v in val]
+        assert out == expected
+        assert [type(o) for o in out] == [type(e) for e in expected]
+
+    @pytest.mark.parametrize("val, arg_type", [
+    # parameters: val, arg_type
+        ([1, 2, 0], 'list-int-pos'),
+        ([1, 2, 3.0], 'list-int'),
+        ([1.0, 2.0, -1.0], 'list-float-whole'),
+        ])
+    def test_long_sequences_errors(self, val, arg_type):
+        with pytest.raises(AssertionError):
+            _assert_types(val * 100, arg_type=arg_type)
+
+    @pytest.mark.parametrize("val, arg_type", [
+    # parameters: val, arg_type
+        (np.arange(1, 10), 'array'),
+        (np.arange(1, 10), 'array-int-pos'),
+        (np.linspace(0, 1), 'array-float-whole'),
+        (np.linspace(0, 1), 'array-int-float'),
+        ])
+    def test_arrays_passing(self, val, arg_type):
+        assert _assert_types(val, arg_type=arg_type) is None
+
+    @pytest.mark.parametrize("val, arg_type", [
+    # parameters: val, arg_type
+        ([1, 2, 3], 'array'),            # Not an array
+        (np.arange(1, 10), 'array-float'), # Wrong dtype
+        (np.arange(0, 10), 'array-int-pos'), # Wrong sign
+        (np.array(['a']), 'array-int-tcast'), # Can't cast
+        ])
+    def test_arrays_AssertionError(self, val, arg_type):
+        with pytest.raises(AssertionError):
+            _assert_types(val, arg_type=arg_type)
+
+    def test_array_casting(self):
+        out = check_kwarg({'x': np.array(['1.5', '2'])}, 'x',
+                arg_type='array-float-pos-tcast')
+        assert out.dtype == float
+        assert (out == [1.5, 2]).all()
+
+        val = np.linspace(1, 2)
+        out = check_kwarg({'x': val}, 'x', arg_type='array-float-tcast')
+        assert out is val
+
+
+class TestCheckKwargsDecorator:
+    """Test the check_kwargs decorator."""
+
+    @staticmethod
+    def make_function():
+        @check_kwargs(
+                ('a', 1, 'int'),
+                {'name': 'b', 'default': '2.0', 'arg_type': 'float-tcast'},
+                KwargSpec('c', required=True),
+                KwargSpec('d', default='popped', pop=True),
+                KwargSpec('e', default='named', pop=True),
+                )
+        def function(e=None, **kwargs):
+            return e, kwargs
+        return function
+
+    def test_defaults_and_casting(self):
+        e, kwargs = self.make_function()(c=3, extra='x')
+        assert kwargs == {'a': 1, 'b': 2.0, 'c': 3, 'extra': 'x'}
+        assert type(kwargs['b']) is float
+        assert e == 'named'
+
+    def test_pop_consumes(self):
+        e, kwargs = self.make_function()(c=3, d='given', e='given')
+        assert 'd' not in kwargs
+        assert e == 'given'
+
+    def test_required(self):
+        with pytest.raises(AssertionError):
+            self.make_function()(a=1)
+
+    def test_wrong_type(self):
+        with pytest.raises(AssertionError):
+            self.make_function()(a=1.0, c=3)
+
+    def test_validation_disabled(self):
+        function = self.make_function()
+        set_kwarg_validation(False)
+        try:
+            e, kwargs = function(a=1.0)
+        finally:
+            set_kwarg_validation(True)
+        assert kwargs == {'a': 1.0, 'b': '2.0', 'c': None}
+
+    def test_positional_args(self):
+        @check_kwargs(('sep', '_', 'str'))
+        def join(sep='_', **kwargs):
+            return sep
+        assert join('-') == '-'
+        assert join() == '_'
+        with pytest.raises(AssertionError):
+            join(1)
+
+        @check_kwargs(
+                KwargSpec('figure', required=True, pop=True),
+                ('dpi', 100, 'int-tcast'),
+                )
+        def save(figure, dpi, *args, **kwargs):
+            return figure, dpi, args, kwargs
+        assert save('fig', '50', 'x') == ('fig', 50, ('x',), {})
+        assert save('fig') == ('fig', 100, (), {})
+        assert save(figure='fig', dpi=20.0) == ('fig', 20, (), {})
+        with pytest.raises(AssertionError):
+            save()
+
+        set_kwarg_validation(False)
+        try:
+            assert save('fig', '50') == ('fig', '50', (), {})
+        finally:
+            set_kwarg_validation(True)
+
+    def test_positional_only_rejected(self):
+        with pytest.raises(AssertionError):
+            @check_kwargs(('a', 1, 'int'))
+            def function(a, /, **kwargs):
+                pass
+
+
 class TestGetFus:
     """Test get_check_kwarg_fu and get_check_add_kwarg_fu.
 
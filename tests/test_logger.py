@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import glob
+import gzip
+import os
+import pytest
+from helpyr import logger as logger_module
+from helpyr.logger import Logger
+
+
+@pytest.fixture
+def log_filepath(tmp_path):
+    return str(tmp_path / "logs" / "log.txt")
+
+def _read(filepath):
+    with open(filepath) as lf:
+        return lf.read()
+
+
+class TestLevels:
+    """Test message levels and early exits."""
+
+    def test_below_level_not_written(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False,
+                level=logger_module.WARNING)
+        logger.write("info message")
+        logger.write("warning message", level=logger_module.WARNING)
+        text = _read(log_filepath)
+        assert "info message" not in text
+        assert "warning message" in text
+
+    def test_is_enabled(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False)
+        assert logger.is_enabled()
+        assert not logger.is_enabled(logger_module.DEBUG)
+
+    def test_no_sinks_disabled(self):
+        logger = Logger(None, default_verbose=False)
+        assert not logger.is_enabled()
+        assert logger.is_enabled(verbose=True)
+
+
+class TestDeferredMessages:
+    """Test callables and %-style args."""
+
+    def test_callable_not_called_when_filtered(self):
+        logger = Logger(None, default_verbose=False)
+        def fail():
+            raise AssertionError("message should not be formatted")
+        logger.write(fail)
+        logger.write(fail, level=logger_module.ERROR)
+
+    def test_callable_called_when_written(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False)
+        logger.write(lambda: ["first", "second"], local_indent=1)
+        text = _read(log_filepath)
+        assert f"{logger.indent_str}first\n{logger.indent_str}second\n" in text
+
+    def test_percent_args(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False)
+        logger.write("%d files in %s", args=(3, ['a', 'b']))
+        assert "3 files in ['a', 'b']" in _read(log_filepath)
+
+    def test_dataframe_not_rendered_when_filtered(self):
+        class Unrenderable:
+            def to_string(self, **kwargs):
+                raise AssertionError("dataframe should not be rendered")
+        logger = Logger(None, default_verbose=False)
+        logger.write_dataframe(Unrenderable(), name='df')
+
+
+class TestRotation:
+    """Test log rotation and the run index."""
+
+    def test_rotate_per_run(self, log_filepath):
+        first = Logger(log_filepath, default_verbose=False)
+        first.write("first run")
+        second = Logger(log_filepath, default_verbose=False,
+                rotate_per_run=True)
+        second.write("second run")
+        second.wait_for_archives()
+
+        assert os.path.isfile(f"{log_filepath}.0000.gz")
+        assert "first run" not in _read(log_filepath)
+
+        # Both runs start at the beginning of their own segment
+        entries = logger_module.load_run_index(log_filepath)
+        assert [entry[2:] for entry in entries] == [(0, 0), (1, 0)]
+
+    def test_read_run_across_segments(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False, max_bytes=200)
+        messages = [f"message {i}" for i in range(50)]
+        for message in messages:
+            logger.write(message)
+        logger.wait_for_archives()
+
+        assert os.path.isfile(f"{log_filepath}.0000.gz")
+        text = logger_module.read_run_log(log_filepath, logger.run_id)
+        for message in messages:
+            assert f"{message}\n" in text
+
+    def test_read_run_stops_at_next_run(self, log_filepath):
+        first = Logger(log_filepath, default_verbose=False)
+        first.write("first run")
+        second = Logger(log_filepath, default_verbose=False)
+        second.write("second run")
+
+        # Usually both runs start in the same second, but they have 
+        # different run ids
+        entries = logger_module.load_run_index(log_filepath)
+        assert [entry[0] for entry in entries] == [first.run_id, second.run_id]
+        text = logger_module.read_run_log(log_filepath, first.run_id)
+        assert "first run" in text
+        assert "second run" not in text
+        text = logger_module.read_run_log(log_filepath, second.run_id)
+        assert "first run" not in text
+        assert "second run" in text
+
+
+    def test_shared_log_file(self, log_filepath):
+        # Two loggers rotating one file don't overwrite each other's 
+        # archives
+        first = Logger(log_filepath, default_verbose=False, max_bytes=300)
+        second = Logger(log_filepath, default_verbose=False, max_bytes=300)
+        for i in range(20):
+            first.write(f"first {i} " + 40*'.')
+            second.write(f"second {i} " + 40*'.')
+        first.wait_for_archives()
+        second.wait_for_archives()
+
+        text = _read(log_filepath)
+        for path in glob.glob(f"{log_filepath}.[0-9]*.gz"):
+            with gzip.open(path, 'rt') as segment:
+                text += segment.read()
+        for logger in [first, second]:
+            assert f"(run {logger.run_id})" in text
+        for i in range(20):
+            assert f"first {i} " in text
+            assert f"second {i} " in text
+
+        text = logger_module.read_run_log(log_filepath, second.run_id)
+        for i in range(20):
+            assert f"second {i} " in text
+
+
+class TestSummarization:
+    """Test summarizing long lists and dataframes."""
+
+    def test_head_tail(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False, max_items=4)
+        logger.write([f"item {i}" for i in range(100)])
+        lines = _read(log_filepath).split('\n')
+        for kept in ["item 0", "item 1", "item 98", "item 99"]:
+            assert kept in lines
+        assert "item 50" not in lines
+        assert "... 96 items not shown ..." in lines
+
+    def test_per_call_limit(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False, max_items=4)
+        logger.write([f"item {i}" for i in range(10)], max_items=False)
+        assert "item 5\n" in _read(log_filepath)
+
+    def test_sample(self, log_filepath):
+        logger = Logger(log_filepath, default_verbose=False, sample_seed=0)
+        logger.write([f"item {i}" for i in range(100)], max_items=5,
+                sample=True)
+        lines = _read(log_filepath).split('\n')
+        assert len([line for line in lines if line.startswith("item")]) == 5
+        assert "... random sample of 5 out of 100 items" in lines
+
+    def test_dataframe_rows(self, log_filepath):
+        pd = pytest.importorskip("pandas")
+        logger = Logger(log_filepath, default_verbose=False)
+        df = pd.DataFrame({'a': range(1000), 'b': 0.5})
+        logger.write_dataframe(df, max_rows=6)
+        text = _read(log_filepath)
+        assert "... 994 rows not shown ..." in text
+        assert " 999 " in text
+
+    def test_dataframe_summary(self, log_filepath):
+        pd = pytest.importorskip("pandas")
+        logger = Logger(log_filepath, default_verbose=False)
+        df = pd.DataFrame({'a': range(1000), 'b': 0.5})
+        logger.write_dataframe(df, summary=True)
+        text = _read(log_filepath)
+        assert "Shape: 1000 rows x 2 columns" in text
+        assert "mean" in text
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpyr.shared_data import SharedData
+from helpyr.shared_data import attach
+
+
+def _column_sums(frame_handle, out_handle, column):
+    # Worker: sum one column of a shared dataframe into a shared array
+    with attach(frame_handle) as data, attach(out_handle) as out:
+        out[column] = data.iloc[:, column].sum()
+        index_sum = data.index.to_numpy().sum()
+    return index_sum
+
+def _frame_total(frame_handle):
+    with attach(frame_handle) as data:
+        return data.to_numpy().sum()
+
+def _first_column(array_handle):
+    with attach(array_handle) as values:
+        return values[:, 0]
+
+def _is_linked(name):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+class TestSharedData:
+
+    def test_array_round_trip(self):
+        array = np.arange(12, dtype=np.int32).reshape(3, 4)
+        with SharedData() as shared:
+            handle = shared.share_array(array)
+            with attach(handle) as view:
+                assert np.array_equal(view, array)
+                assert view.dtype == np.int32
+                view[0, 0] = -1
+            with attach(handle) as view:
+                assert view[0, 0] == -1
+        assert not _is_linked(handle.name)
+
+    def test_frame_views(self):
+        data = pd.DataFrame(np.random.default_rng(0).random((20, 3)),
+                index=pd.Index(np.arange(20) * 2, name='sample'),
+                columns=[0.5, 1.0, 2.0])
+        with SharedData() as shared:
+            handle = shared.share_frame(data)
+            with attach(handle) as shared_data:
+                pd.testing.assert_frame_equal(shared_data, data)
+                # Zero copy. Writes to the shared block show up in the view.
+                with attach(handle.values) as values:
+                    values[0, 0] = -1
+                assert shared_data.iloc[0, 0] == -1
+
+    def test_non_numeric_frames(self):
+        with SharedData() as shared:
+            with pytest.raises(AssertionError):
+                shared.share_frame(pd.DataFrame({'a': ['x', 'y']}))
+            data = pd.DataFrame({'a': [1.0, 2.0]}, index=['x', 'y'])
+            handle = shared.share_frame(data)
+            assert handle.block_names() == [handle.values.name]
+            with attach(handle) as shared_data:
+                pd.testing.assert_frame_equal(shared_data, data)
+
+    def test_reference_counts(self):
+        shared = SharedData()
+        handle = shared.share_array(np.zeros(3))
+        shared.acquire(handle)
+        shared.release(handle)
+        assert _is_linked(handle.name)
+        shared.release(handle)
+        assert not _is_linked(handle.name)
+        assert shared.n_blocks() == 0
+        with pytest.raises(AssertionError):
+            shared.acquire(handle)
+
+    def test_submit_to_processes(self):
+        data = pd.DataFrame(np.arange(30, dtype=float).reshape(10, 3))
+        with SharedData() as shared:
+            frame_handle = shared.share_frame(data)
+            out_handle = shared.empty_array(3)
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                futures = [shared.submit(pool, _column_sums, frame_handle,
+                    out_handle, column) for column in range(3)]
+                assert [f.result() for f in futures] == [45] * 3
+            with attach(out_handle) as sums:
+                assert np.array_equal(sums, data.sum().to_numpy())
+
+            # Only the owner's references are left
+            shared.release(frame_handle)
+            assert shared.n_blocks() == 1
+
+    def test_blocks_close_with_views(self, monkeypatch):
+        closed = []
+        close = shared_memory.SharedMemory.close
+        def tracked_close(shm):
+            closed.append(shm.name)
+            close(shm)
+        monkeypatch.setattr(shared_memory.SharedMemory, 'close', tracked_close)
+
+        data = pd.DataFrame(np.ones((4, 2)), index=np.arange(4) * 2)
+        with SharedData() as shared:
+            handle = shared.share_frame(data)
+            # Like a worker, without any del
+            assert _frame_total(handle) == 8
+            assert set(closed) == set(handle.block_names())
+
+            # Views kept past the with block keep the block mapped
+            closed.clear()
+            column = _first_column(handle.values)
+            assert closed == []
+            assert column.sum() == 4
+            column = None
+            assert set(closed) == {handle.values.name}